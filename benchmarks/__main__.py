@@ -0,0 +1,110 @@
+"""
+Run the benchmark suite.
+
+Usage::
+
+    python -m benchmarks [--filter lookup] [--repeat 5] [--save results.json] [--compare benchmarks/baseline.json]
+                         [--skip-errors]
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import timeit
+
+from .suite import BENCHMARKS
+
+
+def run_benchmark(setup, repeat):
+    directory = tempfile.mkdtemp()
+    try:
+        function, operations = setup(directory)
+        timer = timeit.Timer(function)
+        number, _ = timer.autorange()
+        return min(timer.repeat(repeat=repeat, number=number)) / number / operations
+    finally:
+        shutil.rmtree(directory)
+
+
+def _prettyconf_version():
+    # the version of the measured code (eg. a release checkout), not of the installed distribution
+    import prettyconf
+
+    pyproject = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(prettyconf.__file__))), 'pyproject.toml')
+    try:
+        with open(pyproject) as pyproject_file:
+            for line in pyproject_file:
+                if line.startswith('version = '):
+                    return line.split('=', 1)[1].strip().strip('"')
+    except OSError:
+        pass
+    return None
+
+
+def format_time(seconds):
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+        if seconds >= scale:
+            return f'{seconds / scale:8.2f} {unit}'
+    return f'{seconds / 1e-9:8.2f} ns'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run prettyconf benchmarks.')
+    parser.add_argument('--filter', default='', help='only run benchmarks with names containing this text')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--save', help='save results to a JSON file')
+    parser.add_argument('--compare', help='compare results with a JSON file saved with --save')
+    parser.add_argument(
+        '--skip-errors',
+        action='store_true',
+        help='skip benchmarks that fail (eg. using APIs missing in the prettyconf version measured)',
+    )
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)['results']
+
+    width = max(map(len, BENCHMARKS))
+    results = {}
+    for name, setup in BENCHMARKS.items():
+        if args.filter not in name:
+            continue
+
+        try:
+            results[name] = run_benchmark(setup, args.repeat)
+        except Exception as ex:
+            if not args.skip_errors:
+                raise
+            print(f'{name:<{width}} skipped ({type(ex).__name__}: {ex})')
+            continue
+
+        line = f'{name:<{width}} {format_time(results[name])}/op'
+        if name in baseline:
+            line += f'  {baseline[name] / results[name]:6.2f}x vs baseline'
+        print(line)
+        sys.stdout.flush()
+
+    if args.save:
+        with open(args.save, 'w') as results_file:
+            json.dump(
+                {
+                    'prettyconf': _prettyconf_version(),
+                    'python': platform.python_implementation() + ' ' + platform.python_version(),
+                    'platform': platform.platform(),
+                    'cpus': os.cpu_count(),
+                    'results': results,
+                },
+                results_file,
+                indent=2,
+            )
+            results_file.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Compare the ``EnvFileParser`` strategies: character-level state machine, line
+parser over text streams and line parser over memory mapped files.
+
+Usage::
+
+    python -m benchmarks.bench_envfile [--keys 10000] [--repeat 5]
+"""
+
+import argparse
+import functools
+import os
+import tempfile
+import timeit
+import tracemalloc
+from unittest import mock
+
+from prettyconf.parsers import EnvFileParser, MappedFileReader
+
+from .fixtures import envfile_content
+
+
+def parse_text(filename):
+    with open(filename, encoding='utf-8') as envfile:
+        return dict(EnvFileParser(envfile).parse_config())
+
+
+def parse_state_machine(filename):
+    with mock.patch('prettyconf.parsers._parse_simple_line', return_value=NotImplemented):
+        return parse_text(filename)
+
+
+def parse_mapped(filename):
+    with open(filename, 'rb') as envfile, MappedFileReader(envfile, 'utf-8') as reader:
+        return dict(EnvFileParser(reader).parse_config())
+
+
+def peak_memory(function):
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--keys', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        filename = os.path.join(tempdir, '.env')
+        with open(filename, 'w', encoding='utf-8') as envfile:
+            envfile.write(envfile_content(args.keys))
+
+        strategies = (
+            ('state machine', parse_state_machine),
+            ('line parser', parse_text),
+            ('mmap reader', parse_mapped),
+        )
+        expected = parse_state_machine(filename)
+        size = os.path.getsize(filename) / 1024
+
+        results = {}
+        for name, function in strategies:
+            assert function(filename) == expected
+            benchmark = functools.partial(function, filename)
+            results[name] = min(timeit.repeat(benchmark, number=1, repeat=args.repeat))
+            print(
+                f'{name:>14}: {results[name] * 1000:10.2f} ms, peak {peak_memory(benchmark) / 1024:8.0f} KiB '
+                f'({size:.0f} KiB, {args.keys} keys, {results["state machine"] / results[name]:.2f}x)'
+            )
+
+
+if __name__ == '__main__':
+    main()
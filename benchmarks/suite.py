@@ -0,0 +1,239 @@
+"""
+Benchmarks of prettyconf hot paths. Every benchmark is a setup function that
+receives a scratch directory and returns a ``(function, operations)`` tuple
+where ``function()`` runs ``operations`` times the operation being measured.
+"""
+
+import io
+import os
+import threading
+
+from prettyconf.casts import List
+from prettyconf.configuration import Configuration
+from prettyconf.loaders import EnvFile, Environment, IniFile, RecursiveSearch
+from prettyconf.parsers import EnvFileParser
+
+from . import fixtures
+
+BENCHMARKS = {}
+
+FILE_SIZES = (10, 1000, 100000)
+LOOKUPS = 1000
+THREADS = 8
+
+
+def benchmark(name):
+    def decorator(setup):
+        BENCHMARKS[name] = setup
+        return setup
+
+    return decorator
+
+
+def _lookups(config, item, **kwargs):
+    def run():
+        for _ in range(LOOKUPS):
+            config(item, **kwargs)
+
+    return run, LOOKUPS
+
+
+def _threaded_lookups(config, item, **kwargs):
+    def worker():
+        for _ in range(LOOKUPS):
+            config(item, **kwargs)
+
+    def run():
+        threads = [threading.Thread(target=worker) for _ in range(THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    return run, LOOKUPS * THREADS
+
+
+@benchmark('lookup.environment')
+def lookup_environment(directory):
+    os.environ['PRETTYCONF_BENCHMARK'] = 'value'
+    return _lookups(Configuration(loaders=[Environment()]), 'PRETTYCONF_BENCHMARK')
+
+
+@benchmark('lookup.environment.snapshot')
+def lookup_environment_snapshot(directory):
+    os.environ['PRETTYCONF_BENCHMARK'] = 'value'
+    return _lookups(Configuration(loaders=[Environment(snapshot=True)]), 'PRETTYCONF_BENCHMARK')
+
+
+@benchmark('lookup.inifile')
+def lookup_inifile(directory):
+    return _lookups(Configuration(loaders=[IniFile(fixtures.inifile(directory, 1000))]), 'key_500')
+
+
+@benchmark('lookup.default_loaders')
+def lookup_default_loaders(directory):
+    os.environ['PRETTYCONF_BENCHMARK'] = 'value'
+    return _lookups(Configuration(), 'PRETTYCONF_BENCHMARK')
+
+
+@benchmark('lookup.default_loaders.default_value')
+def lookup_default_loaders_default_value(directory):
+    return _lookups(Configuration(), 'PRETTYCONF_BENCHMARK_MISSING', default='value')
+
+
+@benchmark('lookup.cached')
+def lookup_cached(directory):
+    os.environ['PRETTYCONF_BENCHMARK'] = 'value'
+    return _lookups(Configuration(cache=True), 'PRETTYCONF_BENCHMARK')
+
+
+@benchmark('lookup.observed')
+def lookup_observed(directory):
+    from prettyconf.instrumentation import LookupStatistics  # missing in releases before 2.4 (see --skip-errors)
+
+    os.environ['PRETTYCONF_BENCHMARK'] = 'value'
+    config = Configuration()
+    config.add_observer(LookupStatistics())
+    return _lookups(config, 'PRETTYCONF_BENCHMARK')
+
+
+@benchmark('lookup.loaders_chain.50')
+def lookup_loaders_chain(directory):
+    return _lookups(Configuration(loaders=fixtures.loaders_chain(directory, 50)), 'LAST_LOADER')
+
+
+@benchmark('lookup.loaders_chain.50.default_value')
+def lookup_loaders_chain_default_value(directory):
+    config = Configuration(loaders=fixtures.loaders_chain(directory, 50))
+    return _lookups(config, 'PRETTYCONF_BENCHMARK_MISSING', default='value')
+
+
+@benchmark('lookup.loaders_chain.50.default_value.cache_misses')
+def lookup_loaders_chain_default_value_cache_misses(directory):
+    config = Configuration(loaders=fixtures.loaders_chain(directory, 50), cache_misses=True)
+    return _lookups(config, 'PRETTYCONF_BENCHMARK_MISSING', default='value')
+
+
+@benchmark(f'lookup.threads.{THREADS}')
+def lookup_threads(directory):
+    os.environ['PRETTYCONF_BENCHMARK'] = 'value'
+    return _threaded_lookups(Configuration(), 'PRETTYCONF_BENCHMARK')
+
+
+@benchmark(f'lookup.threads.{THREADS}.loaders_chain.50')
+def lookup_threads_loaders_chain(directory):
+    return _threaded_lookups(Configuration(loaders=fixtures.loaders_chain(directory, 50)), 'LAST_LOADER')
+
+
+def _parse_envfile(keys):
+    def setup(directory):
+        content = fixtures.envfile_content(keys)
+
+        def run():
+            for _ in EnvFileParser(io.StringIO(content)).parse_config():
+                pass
+
+        return run, 1
+
+    return setup
+
+
+def _load_envfile(keys):
+    def setup(directory):
+        filename = fixtures.envfile(directory, keys)
+
+        def run():
+            EnvFile(filename).check()
+
+        return run, 1
+
+    return setup
+
+
+def _load_non_ascii_envfile(keys):
+    def setup(directory):
+        filename = fixtures.non_ascii_envfile(directory, keys)
+
+        def run():
+            EnvFile(filename, encoding='utf-8').check()
+
+        return run, 1
+
+    return setup
+
+
+def _load_inifile(keys):
+    def setup(directory):
+        filename = fixtures.inifile(directory, keys)
+
+        def run():
+            IniFile(filename).check()
+
+        return run, 1
+
+    return setup
+
+
+for _keys in FILE_SIZES:
+    benchmark(f'parse.envfile_parser.{_keys}')(_parse_envfile(_keys))
+    benchmark(f'parse.envfile.{_keys}')(_load_envfile(_keys))
+    benchmark(f'parse.envfile.non_ascii.{_keys}')(_load_non_ascii_envfile(_keys))
+    benchmark(f'parse.inifile.{_keys}')(_load_inifile(_keys))
+
+
+def _discover(depth):
+    def setup(directory):
+        starting_path = fixtures.directory_tree(directory, depth)
+
+        def run():
+            RecursiveSearch(starting_path, root_path=directory).config_files  # noqa: B018
+
+        return run, 1
+
+    return setup
+
+
+def _recursive_search_lookup(depth):
+    def setup(directory):
+        discovery = RecursiveSearch(fixtures.directory_tree(directory, depth), root_path=directory)
+        return _lookups(Configuration(loaders=[discovery]), 'PRETTYCONF_BENCHMARK_MISSING', default='value')
+
+    return setup
+
+
+for _depth in (10, 100):
+    benchmark(f'discovery.depth.{_depth}')(_discover(_depth))
+    benchmark(f'lookup.recursive_search.depth.{_depth}.default_value')(_recursive_search_lookup(_depth))
+
+
+def _list_cast(items, quoted=False):
+    def setup(directory):
+        quote = '"' if quoted else ''
+        value = ', '.join(f'{quote}host{index}.example.com:{8000 + index}{quote}' for index in range(items))
+        cast = List()
+
+        def run():
+            cast(value)
+
+        return run, 1
+
+    return setup
+
+
+def _list_item_cast(items):
+    def setup(directory):
+        value = ', '.join(str(8000 + index) for index in range(items))
+        cast = List(item_cast=int)
+
+        def run():
+            cast(value)
+
+        return run, 1
+
+    return setup
+
+
+for _items in (10, 1000):
+    benchmark(f'cast.list.{_items}')(_list_cast(_items))
+    benchmark(f'cast.list.quoted.{_items}')(_list_cast(_items, quoted=True))
+    benchmark(f'cast.list.item_cast.{_items}')(_list_item_cast(_items))
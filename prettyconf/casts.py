@@ -37,9 +37,25 @@ class Boolean(AbstractCast):
 
 
 class List(AbstractCast):
-    def __init__(self, delimiter=',', quotes='"\''):
+    def __init__(self, delimiter=',', quotes='"\'', item_cast=None):
+        """
+        :param str delimiter: Elements delimiter.
+        :param str quotes: Quote characters protecting delimiters inside elements.
+        :param function item_cast: Cast applied to every (stripped) element.
+        """
         self.delimiter = delimiter
         self.quotes = quotes
+        self.item_cast = item_cast
+
+    def _split(self, string):
+        # fast path: without quotes the elements are just split at the delimiters
+        if isinstance(string, str) and len(self.delimiter) == 1 and not any(q in string for q in self.quotes):
+            elements = string.split(self.delimiter)
+            if not elements[-1]:  # like _parse(), ignore an empty trailing element
+                elements.pop()
+            return elements
+
+        return self._parse(string)
 
     def _parse(self, string):
         elements = []
@@ -73,13 +89,20 @@ class List(AbstractCast):
         if element:
             elements.append(''.join(element))
 
-        return self.cast(e.strip() for e in elements)
+        return elements
 
     def cast(self, sequence):
         return list(sequence)
 
     def __call__(self, value):
-        return self._parse(value)
+        elements = self._split(value)
+        if self.item_cast is None:
+            return self.cast([element.strip() for element in elements])
+
+        try:
+            return self.cast([self.item_cast(element.strip()) for element in elements])
+        except (TypeError, ValueError) as ex:
+            raise InvalidConfiguration(f'Error casting elements of {value!r}') from ex
 
 
 class Tuple(List):
@@ -1,20 +1,31 @@
 import ast
+import functools
 import os
 import sys
+import threading
+import time
 
 from .casts import JSON, Boolean, List, Option, Tuple
 from .exceptions import UnknownConfiguration
-from .loaders import Environment, RecursiveSearch
+from .forking import reset_after_fork
+from .loaders import AbstractConfigurationLoader, Environment, RecursiveSearch
+from .snapshot import read_snapshot, write_snapshot
 
-MAGIC_FRAME_DEPTH = 2
+MAGIC_FRAME_DEPTH = 2  # _caller_path() <- Configuration.__call__()
 
+_NO_DEFAULT = object()
 
-def _caller_path():
+
+@functools.cache
+def _module_path(filename):
+    return os.path.dirname(os.path.abspath(filename))
+
+
+def _caller_path(depth=MAGIC_FRAME_DEPTH):
     # MAGIC! Get the caller's module path.
     # noinspection PyProtectedMember
-    frame = sys._getframe(MAGIC_FRAME_DEPTH)
-    path = os.path.dirname(os.path.abspath(frame.f_code.co_filename))
-    return path
+    frame = sys._getframe(depth)
+    return _module_path(frame.f_code.co_filename)
 
 
 class Configuration:
@@ -26,17 +37,165 @@ class Configuration:
     eval = staticmethod(ast.literal_eval)
     json = JSON()
 
-    def __init__(self, loaders=None):
+    def __init__(self, loaders=None, cache=False, cache_misses=False, cache_size=1024, encoding=None):
+        """
+        :param list loaders: The chain of loaders used to lookup configurations.
+        :param bool cache: Keep the (already casted) configuration values in memory
+                           after their first lookup.
+        :param bool cache_misses: Remember the configurations not found in any loader
+                                  and stop looking for them in the loaders.
+        :param int cache_size: Maximum number of cached values. Values not used
+                               recently are discarded first.
+        :param str encoding: Encoding of the configuration files found by the default
+                             loaders (see ``RecursiveSearch``). Defaults to the locale
+                             preferred encoding.
+        """
         self._recursive_search = None
         if loaders is None:
-            self._recursive_search = RecursiveSearch()
+            self._recursive_search = RecursiveSearch(encoding=encoding)
             loaders = [
                 Environment(),
                 self._recursive_search,
             ]
 
+        self.cache = cache
+        self.cache_size = cache_size
+        self._cache = {}  # cache key -> [value, used since the last eviction?]
+        self._cache_lock = threading.Lock()  # held to change the cache (and misses), not to read it
+        self._generation = 0  # incremented by invalidate()
+        reset_after_fork(self)
+        self.cache_misses = cache_misses
+        self._misses = set()  # (item, starting path) not found in any loader
+        self._starting_path_pinned = False
+        self._observers = ()
+        self._loaders = []
         self.loaders = loaders
 
+    def _after_fork_in_child(self):
+        # may be held by another thread of the parent process while forking
+        self._cache_lock = threading.Lock()
+
+    @property
+    def loaders(self):
+        return self._loaders
+
+    @loaders.setter
+    def loaders(self, loaders):
+        for loader in self._loaders:
+            if hasattr(loader, 'remove_reload_listener'):
+                loader.remove_reload_listener(self._loader_reloaded)
+            if hasattr(loader, 'remove_observer'):
+                for observer in self._observers:
+                    loader.remove_observer(observer)
+
+        self._loaders = loaders
+        for loader in self._loaders:
+            if hasattr(loader, 'add_reload_listener'):
+                loader.add_reload_listener(self._loader_reloaded)
+            if hasattr(loader, 'add_observer'):
+                for observer in self._observers:
+                    loader.add_observer(observer)
+
+        self.invalidate()
+
+    def add_observer(self, observer):
+        """
+        Register an observer of configuration lookups (and of the loads made by
+        the loaders). See ``prettyconf.instrumentation.Observer``.
+        """
+        self._observers = (*self._observers, observer)
+        for loader in self.loaders:
+            if hasattr(loader, 'add_observer'):
+                loader.add_observer(observer)
+
+    def remove_observer(self, observer):
+        self._observers = tuple(registered for registered in self._observers if registered != observer)
+        for loader in self.loaders:
+            if hasattr(loader, 'remove_observer'):
+                loader.remove_observer(observer)
+
+    def pin_starting_path(self, path=None):
+        """
+        Stop detecting the caller's module path on every lookup and always look
+        for configuration files starting at the given path.
+
+        :param str path: The path to begin looking for configuration files. Defaults
+                         to the directory of the module calling this method.
+        """
+        if not self._recursive_search:
+            return
+
+        self._recursive_search.starting_path = path or _caller_path(depth=2)
+        self._starting_path_pinned = True
+        self.invalidate()
+
+    def save_snapshot(self, filename):
+        """
+        Load all configurations (discovering configuration files from the caller's
+        module path) and save them to a snapshot file. Configurations read from the
+        environment or the command line are not saved.
+
+        :param str filename: Path to the snapshot file.
+        """
+        if self._recursive_search and not self._starting_path_pinned:
+            self._recursive_search.starting_path = _caller_path(depth=2)
+
+        write_snapshot(filename, self.loaders)
+
+    def load_snapshot(self, filename):
+        """
+        Restore configurations from a snapshot file saved with ``save_snapshot()``
+        if none of its source files changed.
+
+        :param str filename: Path to the snapshot file.
+        :return: ``True`` if the snapshot was restored or ``False`` if it's missing,
+                 invalid or stale.
+        """
+        restored = read_snapshot(filename, self.loaders)
+        if restored:
+            self.invalidate()
+        return restored
+
+    def preload(self):
+        """
+        Load the configurations of every loader now (discovering configuration
+        files from the caller's module path) instead of on their first lookup.
+        Call it before forking worker processes (eg. in a ``gunicorn --preload``
+        application) so the workers share the loaded configurations.
+        """
+        if self._recursive_search and not self._starting_path_pinned:
+            self._recursive_search.starting_path = _caller_path(depth=2)
+
+        for loader in self.loaders:
+            if hasattr(loader, 'preload'):
+                loader.preload()
+            elif hasattr(loader, 'check'):
+                loader.check()
+
+    def _loader_reloaded(self, loader):
+        self.invalidate()
+
+    def invalidate(self, key=None):
+        """
+        Discard cached configuration values.
+
+        :param str key: Only discard the values cached for this configuration.
+                        Discard all cached values if not given.
+        """
+        if key is None:
+            with self._cache_lock:
+                self._generation += 1
+                self._cache.clear()
+                self._misses.clear()
+            return
+
+        with self._cache_lock:
+            self._generation += 1
+            for cache_key in [cache_key for cache_key in self._cache if cache_key[0] == key]:
+                del self._cache[cache_key]
+            for miss in [miss for miss in self._misses if miss[0] == key]:
+                self._misses.discard(miss)
+
     def __repr__(self):
         loaders = ', '.join([repr(loader) for loader in self.loaders])
         return f'{self.__class__.__name__}(loaders=[{loaders}])'
@@ -45,16 +204,245 @@ class Configuration:
         if not callable(cast):
             raise TypeError('Cast must be callable')
 
-        if self._recursive_search:
-            self._recursive_search.starting_path = _caller_path()
+        starting_path = None
+        if self._recursive_search and not self._starting_path_pinned:
+            # discovered configuration files depend on the caller's module path
+            starting_path = _caller_path()
 
-        for loader in self.loaders:
-            try:
-                return cast(loader[item])
-            except KeyError:
-                continue
+        if self._observers:
+            return self._observed_call(item, cast, kwargs, starting_path)
+
+        if not self.cache:
+            return self._resolve(item, cast, kwargs, starting_path)
+
+        return self._cached_resolve(item, cast, kwargs, starting_path)
+
+    def _cached_resolve(self, item, cast, kwargs, starting_path):
+        default = kwargs.get('default', _NO_DEFAULT)
+        cache_key = (item, cast, type(default), default, starting_path)
+        try:
+            entry = self._cache[cache_key]
+        except KeyError:
+            pass
+        except TypeError:  # unhashable cast or default value
+            return self._resolve(item, cast, kwargs, starting_path)
+        else:
+            if not entry[1]:
+                entry[1] = True
+            return entry[0]
+
+        generation = self._generation
+        value = self._resolve(item, cast, kwargs, starting_path)
+        with self._cache_lock:
+            # not cached if it was resolved before an invalidation (eg. a concurrent reload)
+            if self._generation == generation:
+                self._cache[cache_key] = [value, False]
+                self._evict_cached_values()
+        return value
+
+    def _evict_cached_values(self):
+        # casts created on every call (eg. lambdas or config.option({...})) never hit the
+        # cache, so it's bounded. Values used since the last eviction get a second chance.
+        cache = self._cache
+        while len(cache) > self.cache_size:
+            cache_key = next(iter(cache))  # the oldest
+            entry = cache.pop(cache_key)
+            if entry[1]:
+                entry[1] = False
+                cache[cache_key] = entry
+
+    def _resolve(self, item, cast, kwargs, starting_path):
+        if self._observers:
+            return self._observed_resolve(item, cast, kwargs, starting_path)
+
+        if not self._misses or (item, starting_path) not in self._misses:
+            generation = self._generation
+            recursive_search = self._recursive_search if starting_path else None
+            for loader in self.loaders:
+                try:
+                    if loader is recursive_search:
+                        return cast(loader.lookup(item, starting_path))
+                    return cast(loader[item])
+                except KeyError:
+                    continue
+
+            if self.cache_misses:
+                self._add_misses([(item, starting_path)], generation)
 
         if 'default' not in kwargs:
             raise UnknownConfiguration(f"Configuration '{item}' not found")
 
         return cast(kwargs['default'])
+
+    def _add_misses(self, misses, generation):
+        with self._cache_lock:
+            # not remembered if looked up before an invalidation (eg. a concurrent reload)
+            if self._generation == generation:
+                self._misses.update(misses)
+
+    def _observed_call(self, item, cast, kwargs, starting_path):
+        started = time.perf_counter()
+        try:
+            if not self.cache:
+                return self._resolve(item, cast, kwargs, starting_path)
+
+            return self._cached_resolve(item, cast, kwargs, starting_path)
+        finally:
+            duration = time.perf_counter() - started
+            for observer in self._observers:
+                observer.on_lookup(item, duration)
+
+    def _get(self, loader, item, starting_path):
+        if starting_path and loader is self._recursive_search:
+            # passed down instead of set in the shared loader (see __call__)
+            return loader.lookup(item, starting_path)
+
+        return loader[item]
+
+    def _observed_get(self, loader, item, starting_path=None):
+        started = time.perf_counter()
+        try:
+            value = self._get(loader, item, starting_path)
+        except KeyError:
+            duration = time.perf_counter() - started
+            for observer in self._observers:
+                observer.on_miss(loader, item, duration)
+            raise
+
+        duration = time.perf_counter() - started
+        for observer in self._observers:
+            observer.on_hit(loader, item, duration)
+        return value
+
+    def _observed_cast(self, item, cast, value):
+        try:
+            return cast(value)
+        except KeyError:
+            raise  # not a cast error: like in _resolve(), keep looking in the next loaders
+        except Exception as ex:
+            for observer in self._observers:
+                observer.on_cast_error(item, value, ex)
+            raise
+
+    def _observed_resolve(self, item, cast, kwargs, starting_path):
+        if (item, starting_path) not in self._misses:
+            generation = self._generation
+            for loader in self.loaders:
+                try:
+                    return self._observed_cast(item, cast, self._observed_get(loader, item, starting_path))
+                except KeyError:
+                    continue
+
+            if self.cache_misses:
+                self._add_misses([(item, starting_path)], generation)
+
+        if 'default' not in kwargs:
+            raise UnknownConfiguration(f"Configuration '{item}' not found")
+
+        return self._observed_cast(item, cast, kwargs['default'])
+
+    def many(self, casts, defaults=None):
+        """
+        Lookup many configurations at once, going through each loader only once.
+
+        Example::
+            settings = config.many(
+                {'DEBUG': config.boolean, 'DATABASE_URL': str, 'ALLOWED_HOSTS': config.list},
+                defaults={'DEBUG': False},
+            )
+
+        :param dict casts: Configuration names mapped to their casts.
+        :param dict defaults: Configuration names mapped to their default values.
+        :return: A dict with configuration names mapped to their casted values.
+        """
+        defaults = defaults or {}
+        for cast in casts.values():
+            if not callable(cast):
+                raise TypeError('Cast must be callable')
+
+        values = self._lookup_many(casts, starting_path=_caller_path(depth=2))
+
+        missing = [item for item in casts if item not in values and item not in defaults]
+        if missing:
+            raise UnknownConfiguration(f'Configurations not found: {", ".join(map(repr, missing))}')
+
+        return {item: cast(values[item] if item in values else defaults[item]) for item, cast in casts.items()}
+
+    def explain(self, item):
+        """
+        Find out where the configuration ``item`` is set (looking for configuration
+        files from the caller's module path).
+
+        Example::
+            >>> config.explain('DATABASE_URL')
+            [Origin(loader=EnvFile("/srv/app/.env"), location='/srv/app/.env:3', value='postgres://app'),
+             Origin(loader=IniFile("/srv/settings.ini"), location='/srv/settings.ini [settings]', value='sqlite://')]
+
+        :param str item: The configuration name.
+        :return: A list of ``Origin(loader, location, value)`` with the raw values found
+                 in the loaders chain. The first one is used by ``config()`` and the
+                 others are shadowed by it.
+        """
+        starting_path = None
+        if self._recursive_search and not self._starting_path_pinned:
+            starting_path = _caller_path(depth=2)
+
+        return self._explain(item, starting_path)
+
+    def provenance(self):
+        """
+        Explain (see ``explain()``) every configuration found in the loaders that are
+        able to list their configurations.
+
+        :return: A dict with configuration names mapped to their ``explain()`` results.
+        """
+        starting_path = None
+        if self._recursive_search and not self._starting_path_pinned:
+            starting_path = _caller_path(depth=2)
+
+        items = {}
+        for loader in self.loaders:
+            if starting_path and loader is self._recursive_search:
+                items.update(dict.fromkeys(loader.provenance(starting_path)))
+            elif hasattr(loader, 'provenance'):
+                items.update(dict.fromkeys(loader.provenance()))
+
+        return {item: self._explain(item, starting_path) for item in items}
+
+    def _explain(self, item, starting_path=None):
+        origins = []
+        for loader in self.loaders:
+            if starting_path and loader is self._recursive_search:
+                origins += loader.explain(item, starting_path)
+            elif hasattr(loader, 'explain'):
+                origins += loader.explain(item)
+            else:
+                origins += AbstractConfigurationLoader.explain(loader, item)
+        return origins
+
+    def _lookup_many(self, items, starting_path=None):
+        if not (self._recursive_search and not self._starting_path_pinned):
+            starting_path = None  # the starting path doesn't change (see __call__)
+
+        generation = self._generation
+        values = {}
+        pending = [item for item in items if (item, starting_path) not in self._misses]
+        for loader in self.loaders:
+            if not pending:
+                break
+
+            missing = []
+            for item in pending:
+                try:
+                    if self._observers:
+                        values[item] = self._observed_get(loader, item, starting_path)
+                    else:
+                        values[item] = self._get(loader, item, starting_path)
+                except KeyError:
+                    missing.append(item)
+            pending = missing
+
+        if self.cache_misses:
+            self._add_misses([(item, starting_path) for item in pending], generation)
+
+        return values
@@ -20,3 +20,14 @@ class UnknownConfiguration(ConfigurationException):
 
 class InvalidConfiguration(ConfigurationException):
     pass
+
+
+class InvalidSettings(ConfigurationException):
+    def __init__(self, errors):
+        """
+        :param dict errors: Configuration names mapped to the exceptions raised
+                            while resolving them.
+        """
+        self.errors = errors
+        details = ''.join(f'\n  {name}: {error}' for name, error in errors.items())
+        super().__init__(f'Invalid settings:{details}')
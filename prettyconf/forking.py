@@ -0,0 +1,26 @@
+"""
+Reset the state that can't be used after a ``fork()`` (eg. locks held by other
+threads of the parent process, threads or connections) in the child process.
+"""
+
+import os
+import weakref
+
+_instances = weakref.WeakSet()
+
+
+def reset_after_fork(instance):
+    """
+    Call ``instance._after_fork_in_child()`` in the child process after every
+    ``fork()`` while ``instance`` is alive.
+    """
+    _instances.add(instance)
+
+
+def _after_fork_in_child():
+    for instance in list(_instances):
+        instance._after_fork_in_child()
+
+
+if hasattr(os, 'register_at_fork'):  # not available on Windows
+    os.register_at_fork(after_in_child=_after_fork_in_child)
@@ -0,0 +1,274 @@
+import bisect
+import threading
+from collections import Counter
+
+from .forking import reset_after_fork
+
+# lookups usually take microseconds, loads (parsing files, remote fetches) up to seconds
+DURATION_BUCKETS = (
+    0.000005,
+    0.00001,
+    0.000025,
+    0.00005,
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+)
+
+
+class Observer:
+    """
+    Base class for observers registered with ``Configuration.add_observer()``.
+    Override the hooks you need. Hooks are called synchronously (eventually from
+    many threads) so they must be fast and thread safe.
+    """
+
+    def on_lookup(self, item, duration):
+        """
+        Called after every ``config()`` call (including the ones answered by the
+        cache or failing).
+        """
+
+    def on_hit(self, loader, item, duration):
+        """
+        Called when ``loader`` has the configuration ``item``.
+        """
+
+    def on_miss(self, loader, item, duration):
+        """
+        Called when ``loader`` doesn't have the configuration ``item``.
+        """
+
+    def on_load(self, loader, duration):
+        """
+        Called after ``loader`` (or a configuration file found by ``RecursiveSearch``)
+        loads its configurations.
+        """
+
+    def on_cast_error(self, item, value, exception):
+        """
+        Called when casting the ``value`` of the configuration ``item`` fails.
+        """
+
+
+class Histogram:
+    def __init__(self, buckets=DURATION_BUCKETS):
+        """
+        :param tuple buckets: Sorted upper bounds of the histogram buckets.
+        """
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last one is the +Inf bucket
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative_counts(self):
+        """
+        Returns ``(upper bound, count)`` pairs with the number of observed values
+        lower or equal to the bound (``float('inf')`` for the last one).
+        """
+        total = 0
+        counts = []
+        for bound, count in zip((*self.buckets, float('inf')), self.counts):
+            total += count
+            counts.append((bound, total))
+        return counts
+
+    def to_dict(self):
+        return {'buckets': dict(self.cumulative_counts()), 'sum': self.sum, 'count': self.count}
+
+
+class LoaderStatistics:
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.lookup_duration = Histogram(buckets)
+        self.load_duration = Histogram(buckets)
+
+    def to_dict(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'loads': self.loads,
+            'lookup_duration': self.lookup_duration.to_dict(),
+            'load_duration': self.load_duration.to_dict(),
+        }
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_bound(bound):
+    return '+Inf' if bound == float('inf') else repr(bound)
+
+
+class LookupStatistics(Observer):
+    """
+    Collects lookup statistics: per-loader hits, misses and loads, lookup and load
+    latency histograms and per-configuration read counts.
+
+    Example::
+        statistics = LookupStatistics()
+        config.add_observer(statistics)
+        ...
+        statistics.to_dict()  # or statistics.to_prometheus()
+    """
+
+    def __init__(self, buckets=DURATION_BUCKETS):
+        """
+        :param tuple buckets: Sorted upper bounds (in seconds) of the latency histograms buckets.
+        """
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self.reset()
+        reset_after_fork(self)
+
+    def _after_fork_in_child(self):
+        # may be held by a loader refresh thread of the parent process while forking
+        self._lock = threading.Lock()
+
+    def reset(self):
+        with self._lock:
+            self.reads = Counter()
+            self.cast_errors = Counter()
+            self.lookup_duration = Histogram(self.buckets)
+            self.loaders = {}
+
+    def _loader_statistics(self, loader):
+        try:
+            return self.loaders[loader]
+        except KeyError:
+            statistics = self.loaders[loader] = LoaderStatistics(self.buckets)
+            return statistics
+
+    def on_lookup(self, item, duration):
+        with self._lock:
+            self.reads[item] += 1
+            self.lookup_duration.observe(duration)
+
+    def on_hit(self, loader, item, duration):
+        with self._lock:
+            statistics = self._loader_statistics(loader)
+            statistics.hits += 1
+            statistics.lookup_duration.observe(duration)
+
+    def on_miss(self, loader, item, duration):
+        with self._lock:
+            statistics = self._loader_statistics(loader)
+            statistics.misses += 1
+            statistics.lookup_duration.observe(duration)
+
+    def on_load(self, loader, duration):
+        with self._lock:
+            statistics = self._loader_statistics(loader)
+            statistics.loads += 1
+            statistics.load_duration.observe(duration)
+
+    def on_cast_error(self, item, value, exception):
+        with self._lock:
+            self.cast_errors[item] += 1
+
+    def to_dict(self):
+        """
+        Returns the statistics as a dict. Loaders are identified by their ``repr()``.
+        """
+        with self._lock:
+            return {
+                'reads': dict(self.reads),
+                'cast_errors': dict(self.cast_errors),
+                'lookup_duration': self.lookup_duration.to_dict(),
+                'loaders': {repr(loader): statistics.to_dict() for loader, statistics in self.loaders.items()},
+            }
+
+    def to_prometheus(self, prefix='prettyconf'):
+        """
+        Returns the statistics in the Prometheus text exposition format.
+
+        :param str prefix: Prefix of the metric names.
+        """
+        lines = []
+
+        def metric(name, kind, description, samples):
+            lines.append(f'# HELP {prefix}_{name} {description}')
+            lines.append(f'# TYPE {prefix}_{name} {kind}')
+            for suffix, labels, value in samples:
+                sample = f'{prefix}_{name}{suffix}'
+                if labels:
+                    sample += '{' + ','.join(f'{label}="{_escape_label(text)}"' for label, text in labels) + '}'
+                lines.append(f'{sample} {value}')
+
+        def histogram_samples(histogram, labels=()):
+            for bound, count in histogram.cumulative_counts():
+                yield '_bucket', (*labels, ('le', _format_bound(bound))), count
+            yield '_sum', labels, repr(histogram.sum)
+            yield '_count', labels, histogram.count
+
+        with self._lock:
+            loaders = [((('loader', repr(loader)),), statistics) for loader, statistics in self.loaders.items()]
+            metric(
+                'reads_total',
+                'counter',
+                'Configuration lookups by configuration name.',
+                [('', (('key', item),), count) for item, count in self.reads.items()],
+            )
+            metric(
+                'cast_errors_total',
+                'counter',
+                'Configuration cast errors by configuration name.',
+                [('', (('key', item),), count) for item, count in self.cast_errors.items()],
+            )
+            metric(
+                'lookup_duration_seconds',
+                'histogram',
+                'Configuration lookups duration.',
+                histogram_samples(self.lookup_duration),
+            )
+            metric(
+                'loader_hits_total',
+                'counter',
+                'Configurations found by loader.',
+                [('', labels, statistics.hits) for labels, statistics in loaders],
+            )
+            metric(
+                'loader_misses_total',
+                'counter',
+                'Configurations not found by loader.',
+                [('', labels, statistics.misses) for labels, statistics in loaders],
+            )
+            metric(
+                'loader_lookup_duration_seconds',
+                'histogram',
+                'Loader lookups duration.',
+                [sample for labels, stats in loaders for sample in histogram_samples(stats.lookup_duration, labels)],
+            )
+            metric(
+                'loader_loads_total',
+                'counter',
+                'Configurations (re)loads by loader.',
+                [('', labels, statistics.loads) for labels, statistics in loaders],
+            )
+            metric(
+                'loader_load_duration_seconds',
+                'histogram',
+                'Loader (re)loads duration.',
+                [sample for labels, stats in loaders for sample in histogram_samples(stats.load_duration, labels)],
+            )
+
+        return '\n'.join(lines) + '\n'
@@ -1,15 +1,65 @@
+import fnmatch
+import functools
+import locale
 import os
-from configparser import ConfigParser, MissingSectionHeaderError, NoOptionError
-from glob import glob
-
-try:
-    import boto3
-    import botocore
-except ImportError:
-    boto3 = None
+import threading
+import time
+from collections import namedtuple
+from configparser import ConfigParser, InterpolationError, MissingSectionHeaderError
+from glob import glob, has_magic
 
 from .exceptions import InvalidConfigurationFile, InvalidPath, MissingSettingsSection
-from .parsers import EnvFileParser
+from .forking import reset_after_fork
+from .parsers import EnvFileParser, MappedFileReader, is_ascii_compatible
+
+# optional dependencies imported when a loader requiring them is created
+boto3 = None
+botocore = None
+
+
+def _import_boto3():
+    global boto3, botocore
+
+    if boto3 is None:
+        try:
+            import boto3
+        except ImportError:
+            return False
+
+    if botocore is None:
+        import botocore.exceptions
+
+    return True
+
+
+def _list_directory(path):
+    try:
+        with os.scandir(path) as entries:
+            return [entry.name for entry in entries]
+    except OSError:  # missing path, not a directory, etc.
+        return []
+
+
+def _match_filenames(path, names, patterns):
+    """
+    Match the ``names`` listed in ``path`` against ``patterns`` (in the same order
+    and with the same hidden files handling of ``glob()``).
+    """
+    filenames = []
+    for pattern in patterns:
+        if os.sep in pattern or (os.altsep and os.altsep in pattern):
+            filenames += glob(os.path.join(path, pattern))
+        elif not has_magic(pattern):
+            if pattern in names:
+                filenames.append(os.path.join(path, pattern))
+        else:
+            hidden = pattern.startswith('.')  # wildcards only match hidden files explicitly
+            filenames += [
+                os.path.join(path, name)
+                for name in names
+                if (hidden or not name.startswith('.')) and fnmatch.fnmatch(name, pattern)
+            ]
+    return filenames
 
 
 class NotSet(str):
@@ -26,6 +76,8 @@ class NotSet(str):
 
 NOT_SET = NotSet()
 
+_MISSING = object()
+
 
 def get_args(parser):
     """
@@ -41,7 +93,19 @@ def get_args(parser):
     return {key: val for key, val in args if not isinstance(val, NotSet)}
 
 
+Origin = namedtuple('Origin', ['loader', 'location', 'value'])
+Origin.__doc__ = """
+Where a loader found a configuration: the ``loader``, a human readable ``location``
+(eg. a file path and line number, ``None`` if unknown) and the (raw) ``value``.
+The ``value`` is the exception raised when reading it for configurations that
+can't be read (eg. an ``InterpolationError`` for broken ``IniFile`` values).
+"""
+
+
 class AbstractConfigurationLoader:
+    _reload_listeners = ()
+    _observers = ()
+
     def __repr__(self):
         raise NotImplementedError()  # pragma: no cover
 
@@ -54,10 +118,135 @@ class AbstractConfigurationLoader:
     def check(self):
         return True
 
+    def preload(self):
+        """
+        Load the configurations now instead of on the first lookup (eg. before
+        forking worker processes).
+        """
+        self.check()
+
+    def explain(self, item):
+        """
+        Returns a list with the ``Origin`` of the configuration ``item`` (empty if
+        this loader doesn't have it). Loaders aware of their configurations
+        locations should override this method and ``provenance()``.
+        """
+        try:
+            return [Origin(self, None, self[item])]
+        except KeyError:
+            return []
+
+    def provenance(self):
+        """
+        Returns a dict with the names of all configurations of this loader mapped
+        to their ``explain()`` results. Loaders that can't list their
+        configurations return an empty dict.
+        """
+        return {}
+
+    def add_reload_listener(self, listener):
+        """
+        Register a callable that will be called with this loader as its only
+        argument every time the loader reloads its configurations.
+        """
+        self._reload_listeners = (*self._reload_listeners, listener)
+
+    def remove_reload_listener(self, listener):
+        self._reload_listeners = tuple(registered for registered in self._reload_listeners if registered != listener)
+
+    def notify_reload(self):
+        """
+        Loaders that are able to reload their configurations must call this
+        method after a reload so that caches built on top of them are discarded.
+        """
+        for listener in self._reload_listeners:
+            listener(self)
+
+    def add_observer(self, observer):
+        """
+        Register an observer (see ``prettyconf.instrumentation.Observer``) of the
+        loads made by this loader.
+        """
+        self._observers = (*self._observers, observer)
+
+    def remove_observer(self, observer):
+        self._observers = tuple(registered for registered in self._observers if registered != observer)
+
+    def _notify_load(self, duration):
+        """
+        Loaders must call this method after (re)loading their configurations.
+
+        :param float duration: Load duration in seconds.
+        """
+        for observer in self._observers:
+            observer.on_load(self, duration)
+
+    def _snapshot_state(self):
+        """
+        Returns a ``(state, sources)`` tuple where ``state`` (serializable with
+        ``marshal``) can be restored with ``_prepare_snapshot_restore()`` as long as
+        the ``sources`` files don't change. Returns ``None`` for loaders that must
+        not be snapshotted.
+        """
+        return None
+
+    def _prepare_snapshot_restore(self, state):
+        """
+        Returns a function that restores the ``state`` saved by ``_snapshot_state()``
+        or ``None`` if it can't be restored in this loader. Nothing changes until the
+        function is called, so a snapshot is only restored if every loader accepts it.
+        """
+        return None
+
 
 # noinspection PyAbstractClass
 class AbstractConfigurationFileLoader(AbstractConfigurationLoader):
     file_filters = ()
+    reload_interval = None
+    _file_signature = None
+    _next_reload_check = None  # not parsed yet
+
+    def _stat_file(self):
+        try:
+            stat = os.stat(self.filename)
+        except OSError:
+            return None
+
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def _file_parsed(self):
+        if self.reload_interval is not None:
+            self._file_signature = self._stat_file()
+            self._next_reload_check = time.monotonic() + self.reload_interval
+
+    def _reload_if_changed(self):
+        """
+        Discard the parsed configurations if the file changed (stating it at most
+        once every ``reload_interval`` seconds).
+        """
+        if self.reload_interval is None or self._next_reload_check is None:
+            return
+
+        now = time.monotonic()
+        if now < self._next_reload_check:
+            return
+
+        self._next_reload_check = now + self.reload_interval
+        signature = self._stat_file()
+        if signature == self._file_signature:
+            return
+
+        # also kept when the file is removed (and not parsed again) to notify the change only once
+        self._file_signature = signature
+        self._reset()
+        self.notify_reload()
+
+    def _reset(self):
+        # keeps the current configurations so concurrent lookups never see a missing one
+        self._initialized = False
+
+    def _after_fork_in_child(self):
+        self._load_lock = threading.Lock()
 
 
 class CommandLine(AbstractConfigurationLoader):
@@ -78,6 +267,15 @@ class CommandLine(AbstractConfigurationLoader):
     def __repr__(self):
         return f'CommandLine(parser={self.parser})'
 
+    def explain(self, item):
+        if item not in self.configs:
+            return []
+
+        return [Origin(self, 'command line', self.configs[item])]
+
+    def provenance(self):
+        return {item: self.explain(item) for item in self.configs}
+
     def __contains__(self, item):
         return item in self.configs
 
@@ -88,17 +286,27 @@ class CommandLine(AbstractConfigurationLoader):
 class IniFile(AbstractConfigurationFileLoader):
     file_extensions = ('*.ini', '*.cfg')
 
-    def __init__(self, filename, section='settings', var_format=lambda x: x):
+    def __init__(self, filename, section='settings', var_format=lambda x: x, reload_interval=None, encoding=None):
         """
         :param str filename: Path to the ``.ini/.cfg`` file.
         :param str section: Section name inside the config file.
         :param function var_format: A function to pre-format variable names.
+        :param float reload_interval: Check if the file changed (and reload it) at most
+                                      once every given number of seconds.
+        :param str encoding: Encoding of the file. Defaults to the locale preferred
+                             encoding.
         """
         self.filename = filename
         self.section = section
         self.var_format = var_format
-        self.parser = ConfigParser(allow_no_value=True)
+        self.reload_interval = reload_interval
+        self.encoding = encoding
+        self.configs = {}  # option -> interpolated value
+        self._errors = {}  # option -> interpolation error (raised when looked up)
+        self._values = {}  # item -> value (or _MISSING)
         self._initialized = False
+        self._load_lock = threading.Lock()
+        reset_after_fork(self)
 
     def __repr__(self):
         return f'IniFile("{self.filename}")'
@@ -107,18 +315,73 @@ class IniFile(AbstractConfigurationFileLoader):
         if self._initialized:
             return
 
-        with open(self.filename) as inifile:
-            try:
-                self.parser.read_file(inifile)
-            except (UnicodeDecodeError, MissingSectionHeaderError) as ex:
-                raise InvalidConfigurationFile() from ex
+        with self._load_lock:
+            if self._initialized:  # parsed by another thread while we waited
+                return
+
+            started = time.perf_counter()
+            self._file_parsed()
+            parser = ConfigParser(allow_no_value=True)
+            with open(self.filename, encoding=self.encoding) as inifile:
+                try:
+                    parser.read_file(inifile)
+                except (UnicodeDecodeError, MissingSectionHeaderError) as ex:
+                    raise InvalidConfigurationFile() from ex
+
+            if not parser.has_section(self.section):
+                raise MissingSettingsSection(f'Missing [{self.section}] section in {self.filename}')
+
+            self._publish(*self._read_options(parser))
+
+        self._notify_load(time.perf_counter() - started)
 
-        if not self.parser.has_section(self.section):
-            raise MissingSettingsSection(f'Missing [{self.section}] section in {self.filename}')
+    def _read_options(self, parser):
+        """
+        Interpolate the options of the section (and the ``DEFAULT`` section) once.
+        """
+        configs, errors = {}, {}
+        values = dict(parser.items(self.section, raw=True))
+        for option in parser.options(self.section):  # section options first
+            value = values[option]
+            if value is not None and '%' in value:  # values without '%' aren't changed by BasicInterpolation
+                try:
+                    value = parser.get(self.section, option)
+                except InterpolationError as ex:
+                    errors[option] = ex
+                    continue
+            configs[option] = value
+        return configs, errors
 
+    def _publish(self, configs, errors):
+        self.configs, self._errors = configs, errors
+        self._values = {}  # replaced after configs so _get() never memoizes stale values in it
         self._initialized = True
 
+    def _snapshot_state(self):
+        if not self.check():
+            return None
+
+        errors = {option: error.message for option, error in self._errors.items()}
+        state = {'filename': self.filename, 'section': self.section, 'configs': self.configs, 'errors': errors}
+        return state, [self.filename]
+
+    def _prepare_snapshot_restore(self, state):
+        if (state['filename'], state['section']) != (self.filename, self.section):
+            return None
+
+        configs = dict(state['configs'])
+        errors = {
+            option: InterpolationError(option, self.section, message) for option, message in state['errors'].items()
+        }
+
+        def restore():
+            self._publish(configs, errors)
+            self._file_parsed()
+
+        return restore
+
     def check(self):
+        self._reload_if_changed()
         try:
             self._parse()
         except (FileNotFoundError, InvalidConfigurationFile, MissingSettingsSection):
@@ -126,20 +389,51 @@ class IniFile(AbstractConfigurationFileLoader):
 
         return super().check()
 
+    def explain(self, item):
+        if item not in self:
+            return []
+
+        location = f'{self.filename} [{self.section}]'
+        try:
+            return [Origin(self, location, self[item])]
+        except InterpolationError as ex:
+            return [Origin(self, location, ex)]  # reported, not raised
+
+    def provenance(self):
+        if not self.check():
+            return {}
+
+        return {option: self.explain(option) for option in [*self.configs, *self._errors]}
+
+    def _option(self, item):
+        return self.var_format(item).lower()  # ConfigParser lowercases option names
+
+    def _get(self, item):
+        values = self._values
+        try:
+            return values[item]
+        except KeyError:
+            value = values[item] = self.configs.get(self._option(item), _MISSING)
+            return value
+
     def __contains__(self, item):
         if not self.check():
             return False
 
-        return self.parser.has_option(self.section, self.var_format(item))
+        return self._get(item) is not _MISSING or self._option(item) in self._errors
 
     def __getitem__(self, item):
         if not self.check():
             raise KeyError(f'{item!r}')
 
-        try:
-            return self.parser.get(self.section, self.var_format(item))
-        except NoOptionError as ex:
-            raise KeyError(f'{item!r}') from ex
+        value = self._get(item)
+        if value is _MISSING:
+            error = self._errors.get(self._option(item))
+            if error is not None:
+                raise error.with_traceback(None)  # as ConfigParser.get() would
+            raise KeyError(f'{item!r}')
+
+        return value
 
 
 class Environment(AbstractConfigurationLoader):
@@ -147,48 +441,157 @@ class Environment(AbstractConfigurationLoader):
     Get's configuration from the environment, by inspecting ``os.environ``.
     """
 
-    def __init__(self, var_format=str.upper):
+    def __init__(self, var_format=str.upper, snapshot=False):
         """
         :param function var_format: A function to pre-format variable names.
+        :param bool snapshot: Copy the environment once (and on every ``refresh()``)
+                              instead of reading ``os.environ`` on every lookup.
         """
         self.var_format = var_format
+        self.snapshot = snapshot
+        self._environ = None
+        self._values = None  # snapshot mode: item -> value (or _MISSING)
+        if snapshot:
+            self._take_snapshot()
 
     def __repr__(self):
         return f'Environment(var_format={self.var_format})'
 
+    def _take_snapshot(self):
+        started = time.perf_counter()
+        self._environ = dict(os.environ)
+        self._values = {}  # replaced after _environ so _get() never memoizes stale values in it
+        self._notify_load(time.perf_counter() - started)
+
+    def refresh(self):
+        """
+        Copy the environment again (in snapshot mode) and notify that the
+        configurations were reloaded (eg. to discard values cached by ``Configuration``
+        after changing ``os.environ``).
+        """
+        if self.snapshot:
+            self._take_snapshot()
+        self.notify_reload()
+
+    def _get(self, item):
+        values = self._values
+        try:
+            return values[item]
+        except KeyError:
+            value = values[item] = self._environ.get(self.var_format(item), _MISSING)
+            return value
+
+    def explain(self, item):
+        name = self.var_format(item)
+        environ = os.environ if self._environ is None else self._environ
+        try:
+            return [Origin(self, f'environment variable {name}', environ[name])]
+        except KeyError:
+            return []
+
+    def provenance(self):
+        environ = os.environ if self._environ is None else self._environ
+        return {name: [Origin(self, f'environment variable {name}', value)] for name, value in environ.items()}
+
     def __contains__(self, item):
-        return self.var_format(item) in os.environ
+        if self._values is None:
+            return self.var_format(item) in os.environ
+
+        return self._get(item) is not _MISSING
 
     def __getitem__(self, item):
-        # Uses `os.environ` because it raises an exception if the environmental
-        # variable does not exist, whilst `os.getenv` doesn't.
-        return os.environ[self.var_format(item)]
+        if self._values is None:
+            # Uses `os.environ` because it raises an exception if the environmental
+            # variable does not exist, whilst `os.getenv` doesn't.
+            return os.environ[self.var_format(item)]
+
+        value = self._get(item)
+        if value is _MISSING:
+            raise KeyError(f'{item!r}')
+
+        return value
 
 
 class EnvFile(AbstractConfigurationFileLoader):
     file_extensions = ('.env',)
 
-    def __init__(self, filename='.env', var_format=str.upper):
+    def __init__(self, filename='.env', var_format=str.upper, reload_interval=None, encoding=None):
         """
         :param str filename: Path to the ``.env`` file.
         :param function var_format: A function to pre-format variable names.
+        :param float reload_interval: Check if the file changed (and reload it) at most
+                                      once every given number of seconds.
+        :param str encoding: Encoding of the file. Defaults to the locale preferred
+                             encoding.
         """
         self.filename = filename
         self.var_format = var_format
+        self.reload_interval = reload_interval
+        self.encoding = encoding
         self.configs = None
+        self._lines = {}  # configuration name -> line number
+        self._initialized = False
+        self._load_lock = threading.Lock()
+        reset_after_fork(self)
 
     def __repr__(self):
         return f'EnvFile("{self.filename}")'
 
     def _parse(self):
-        if self.configs is not None:
+        if self._initialized:
             return
 
-        self.configs = {}
-        with open(self.filename) as envfile:
-            self.configs.update(EnvFileParser(envfile).parse_config())
+        with self._load_lock:
+            if self._initialized:  # parsed by another thread while we waited
+                return
+
+            started = time.perf_counter()
+            self._file_parsed()
+            encoding = self.encoding or locale.getpreferredencoding(False)
+            if is_ascii_compatible(encoding):
+                # files watched for changes may be truncated (rewritten in place) while they're parsed
+                mapped = self.reload_interval is None
+                with open(self.filename, 'rb') as envfile, MappedFileReader(envfile, encoding, mapped) as reader:
+                    configs, lines = self._read_configs(EnvFileParser(reader))
+            else:
+                with open(self.filename, encoding=encoding) as envfile:
+                    configs, lines = self._read_configs(EnvFileParser(envfile))
+
+            # publish fully parsed configurations only
+            self._lines, self.configs = lines, configs
+            self._initialized = True
+
+        self._notify_load(time.perf_counter() - started)
+
+    @staticmethod
+    def _read_configs(parser):
+        configs, lines = {}, {}
+        for key, value in parser.parse_config():
+            configs[key] = value
+            lines[key] = parser.config_line
+        return configs, lines
+
+    def _snapshot_state(self):
+        if not self.check():
+            return None
+
+        return {'filename': self.filename, 'configs': self.configs, 'lines': self._lines}, [self.filename]
+
+    def _prepare_snapshot_restore(self, state):
+        if state['filename'] != self.filename:
+            return None
+
+        lines, configs = dict(state['lines']), dict(state['configs'])
+
+        def restore():
+            self._lines, self.configs = lines, configs
+            self._initialized = True
+            self._file_parsed()
+
+        return restore
 
     def check(self):
+        self._reload_if_changed()
         if not os.path.isfile(self.filename):
             return False
 
@@ -199,6 +602,21 @@ class EnvFile(AbstractConfigurationFileLoader):
 
         return super().check()
 
+    def _origin(self, key):
+        return Origin(self, f'{self.filename}:{self._lines[key]}', self.configs[key])
+
+    def explain(self, item):
+        if item not in self:
+            return []
+
+        return [self._origin(self.var_format(item))]
+
+    def provenance(self):
+        if not self.check():
+            return {}
+
+        return {key: [self._origin(key)] for key in self.configs}
+
     def __contains__(self, item):
         if not self.check():
             return False
@@ -213,7 +631,14 @@ class EnvFile(AbstractConfigurationFileLoader):
 
 
 class RecursiveSearch(AbstractConfigurationLoader):
-    def __init__(self, starting_path=None, filetypes=(('.env', EnvFile), (('*.ini', '*.cfg'), IniFile)), root_path='/'):
+    def __init__(
+        self,
+        starting_path=None,
+        filetypes=(('.env', EnvFile), (('*.ini', '*.cfg'), IniFile)),
+        root_path='/',
+        reload_interval=None,
+        encoding=None,
+    ):
         """
         :param str starting_path: The path to begin looking for configuration files.
         :param tuple filetypes: tuple of tuples with configuration loaders, order matters.
@@ -221,15 +646,27 @@ class RecursiveSearch(AbstractConfigurationLoader):
                                 ``(('*.env', EnvFile), (('*.ini', *.cfg',), IniFile)``
         :param str root_path: Configuration lookup will stop at the given path. Defaults to
                               the current user directory
+        :param float reload_interval: ``reload_interval`` of the configuration file loaders
+                                      created for the files found.
+        :param str encoding: ``encoding`` of the configuration file loaders created for
+                             the files found. Defaults to the locale preferred encoding.
         """
+        self.reload_interval = reload_interval
+        self.encoding = encoding
         self.root_path = os.path.realpath(root_path)
         self._starting_path = self.root_path
+        self._resolved_paths = {}
 
         if starting_path:
             self.starting_path = starting_path
 
         self.filetypes = filetypes
-        self._config_files = None
+        self._config_files = {}  # starting path -> config files found up to root_path
+        self._scanned_paths = {}  # directory -> config files found in it
+        self._indexes = {}  # starting path -> {item: value found in config files (or _MISSING)}
+        self._next_reload_checks = {}  # starting path -> time of the next reload check
+        self._discover_lock = threading.Lock()
+        reset_after_fork(self)
 
     @property
     def starting_path(self):
@@ -237,77 +674,286 @@ class RecursiveSearch(AbstractConfigurationLoader):
 
     @starting_path.setter
     def starting_path(self, path):
+        self._starting_path = self._resolve_starting_path(path)
+
+    def _resolve_starting_path(self, path):
+        try:
+            return self._resolved_paths[path]
+        except KeyError:
+            pass
+
         if not path:
             raise InvalidPath('Invalid starting path')
 
-        path = os.path.realpath(os.path.abspath(path))
-        if not path.startswith(self.root_path):
+        resolved_path = os.path.realpath(os.path.abspath(path))
+        if not resolved_path.startswith(self.root_path):
             raise InvalidPath('Invalid root path given')
-        self._starting_path = path
+
+        if os.path.isabs(path):
+            # relative paths depend on the current working directory
+            self._resolved_paths[path] = resolved_path
+        return resolved_path
 
     @staticmethod
     def get_filenames(path, patterns):
-        filenames = []
         if isinstance(patterns, str):
             patterns = (patterns,)
 
-        for pattern in patterns:
-            filenames += glob(os.path.join(path, pattern))
-        return filenames
+        return _match_filenames(path, _list_directory(path), patterns)
+
+    def _find_config_files(self, path):
+        """
+        Returns ``(filename, Loader)`` tuples for the files in ``path`` matching
+        ``filetypes`` (listing the directory only once).
+        """
+        names = _list_directory(path)
+        found = []
+        for patterns, Loader in self.filetypes:
+            if isinstance(patterns, str):
+                patterns = (patterns,)
+            found += [(filename, Loader) for filename in _match_filenames(path, names, patterns)]
+        return found
+
+    def _create_loader(self, Loader, filename):
+        kwargs = {}
+        if self.reload_interval is not None:
+            kwargs['reload_interval'] = self.reload_interval
+        if self.encoding is not None:
+            kwargs['encoding'] = self.encoding
+        loader = Loader(filename=filename, **kwargs)
+        loader.add_reload_listener(self._config_file_reloaded)
+        for observer in self._observers:
+            loader.add_observer(observer)
+        return loader
+
+    def _config_file_loaders(self):
+        for config_files in self._scanned_paths.values():
+            yield from config_files
+
+    def add_observer(self, observer):
+        super().add_observer(observer)
+        for config_file in self._config_file_loaders():
+            config_file.add_observer(observer)
+
+    def remove_observer(self, observer):
+        super().remove_observer(observer)
+        for config_file in self._config_file_loaders():
+            config_file.remove_observer(observer)
+
+    def _after_fork_in_child(self):
+        self._discover_lock = threading.Lock()
 
     def _scan_path(self, path):
         config_files = []
 
-        for patterns, Loader in self.filetypes:
-            for filename in self.get_filenames(path, patterns):
-                try:
-                    loader = Loader(filename=filename)
-                    if not loader.check():
-                        continue
-                    config_files.append(loader)
-                except InvalidConfigurationFile:
+        for filename, Loader in self._find_config_files(path):
+            try:
+                loader = self._create_loader(Loader, filename)
+                if not loader.check():
                     continue
+                config_files.append(loader)
+            except InvalidConfigurationFile:
+                continue
 
         return config_files
 
-    def _discover(self):
-        self._config_files = []
+    def _scan_path_cached(self, path):
+        try:
+            return self._scanned_paths[path]
+        except KeyError:
+            pass
+
+        config_files = self._scan_path(path)
+        self._scanned_paths[path] = config_files
+        return config_files
+
+    def _config_file_reloaded(self, loader):
+        self._indexes = {}
+        self.notify_reload()
+
+    def _check_config_files(self, starting_path):
+        """
+        Let the configuration files reload themselves (at most once every
+        ``reload_interval`` seconds) since lookups answered by the index skip them.
+        """
+        now = time.monotonic()
+        if now < self._next_reload_checks.get(starting_path, 0):
+            return
+
+        # one timer per starting path: lookups from other paths don't check these files
+        self._next_reload_checks[starting_path] = now + self.reload_interval
+        for config_file in self._config_files_from(starting_path):
+            config_file.check()
+
+    def _snapshot_state(self):
+        self.config_files  # noqa: B018 (discover files for the current starting path)
+
+        loader_classes = [Loader for _, Loader in self.filetypes]
+        directories = {}
+        sources = []
+        for path, config_files in self._scanned_paths.items():
+            files = []
+            for config_file in config_files:
+                snapshot = config_file._snapshot_state()
+                if snapshot is None:
+                    continue
+                state, file_sources = snapshot
+                files.append((loader_classes.index(type(config_file)), state))
+                sources += file_sources
+            directories[path] = files
+
+            # new, removed or changed (eg. fixed) files in the directory
+            sources.append(path)
+            sources += [filename for filename, _ in self._find_config_files(path)]
+
+        return {'root_path': self.root_path, 'directories': directories}, sources
+
+    def _prepare_snapshot_restore(self, state):
+        if state['root_path'] != self.root_path:
+            return None
+
+        loader_classes = [Loader for _, Loader in self.filetypes]
+        scanned_paths = {}
+        restores = []
+        for path, files in state['directories'].items():
+            config_files = []
+            for index, file_state in files:
+                if index >= len(loader_classes):
+                    return None
+                loader = self._create_loader(loader_classes[index], file_state['filename'])
+                restore_file = loader._prepare_snapshot_restore(file_state)
+                if restore_file is None:
+                    return None
+                restores.append(restore_file)
+                config_files.append(loader)
+            scanned_paths[path] = config_files
+
+        def restore():
+            for restore_file in restores:
+                restore_file()
+            self._scanned_paths = scanned_paths
+            self._config_files = {}
+            self._indexes = {}
+
+        return restore
+
+    def _discover(self, starting_path):
+        config_files = []
 
-        path = self.starting_path
+        path = starting_path
         while True:
-            if os.path.isdir(path):
-                self._config_files += self._scan_path(path)
+            config_files += self._scan_path_cached(path)
 
-            if path == self.root_path:
+            parent = os.path.dirname(path)
+            if path == self.root_path or parent == path:
                 break
 
-            path = os.path.dirname(path)
+            path = parent
+
+        self._config_files[starting_path] = config_files
+        return config_files
 
     @property
     def config_files(self):
-        if self._config_files is None:
-            self._discover()
+        return self._config_files_from(self.starting_path)
 
-        return self._config_files
+    def _config_files_from(self, starting_path):
+        """
+        Returns the configuration files found from the (resolved) ``starting_path``
+        up to ``root_path``, discovering them only once.
+        """
+        try:
+            return self._config_files[starting_path]
+        except KeyError:
+            pass
+
+        with self._discover_lock:
+            try:  # discovered by another thread while we waited
+                return self._config_files[starting_path]
+            except KeyError:
+                return self._discover(starting_path)
 
     def __repr__(self):
         return f'RecursiveSearch(starting_path={self.starting_path})'
 
-    def __contains__(self, item):
-        for config_file in self.config_files:
-            if item in config_file:
-                return True
-        return False
+    def preload(self):
+        self.config_files  # noqa: B018 (discover and parse the files for the current starting path)
 
-    def __getitem__(self, item):
-        for config_file in self.config_files:
+    def _starting_path_or_current(self, starting_path):
+        return self._starting_path if starting_path is None else self._resolve_starting_path(starting_path)
+
+    def explain(self, item, starting_path=None):
+        """
+        :param str starting_path: Look for configuration files from this path instead
+                                  of ``self.starting_path``.
+        """
+        origins = []
+        for config_file in self._config_files_from(self._starting_path_or_current(starting_path)):
+            origins += config_file.explain(item)
+        return origins
+
+    def provenance(self, starting_path=None):
+        """
+        :param str starting_path: Look for configuration files from this path instead
+                                  of ``self.starting_path``.
+        """
+        provenance = {}
+        for config_file in self._config_files_from(self._starting_path_or_current(starting_path)):
+            for item, origins in config_file.provenance().items():
+                provenance.setdefault(item, []).extend(origins)
+        return provenance
+
+    def _lookup(self, item, starting_path):
+        for config_file in self._config_files_from(starting_path):
             try:
                 return config_file[item]
             except KeyError:
                 continue
-        else:
+
+        return _MISSING
+
+    def _get(self, item, starting_path):
+        """
+        Returns the value of ``item`` in the configuration files found from the
+        (resolved) ``starting_path`` (or ``_MISSING``), looking it up only once.
+        """
+        if self.reload_interval is not None:
+            self._check_config_files(starting_path)
+
+        indexes = self._indexes  # replaced when configuration files are reloaded
+        try:
+            index = indexes[starting_path]
+        except KeyError:
+            index = indexes[starting_path] = {}
+
+        try:
+            return index[item]
+        except KeyError:
+            value = index[item] = self._lookup(item, starting_path)
+            return value
+
+    def lookup(self, item, starting_path=None):
+        """
+        Returns the value of ``item`` found in the configuration files. Unlike
+        setting ``starting_path`` before looking ``item`` up, it's safe to use from
+        many threads looking for configuration files from different paths.
+
+        :param str starting_path: Look for configuration files from this path instead
+                                  of ``self.starting_path``.
+        :raises KeyError: if ``item`` isn't found.
+        """
+        value = self._get(item, self._starting_path_or_current(starting_path))
+        if value is _MISSING:
             raise KeyError(f'{item!r}')
 
+        return value
+
+    def __contains__(self, item):
+        return self._get(item, self._starting_path) is not _MISSING
+
+    def __getitem__(self, item):
+        return self.lookup(item)
+
 
 class AwsParameterStore(AbstractConfigurationLoader):
     def __init__(
@@ -317,46 +963,163 @@ class AwsParameterStore(AbstractConfigurationLoader):
         aws_secret_access_key=None,
         region_name='us-east-1',
         endpoint_url=None,
+        recursive=False,
+        max_workers=4,
+        ttl=None,
+        on_refresh=None,
     ):
-        if not boto3:
+        """
+        :param path: A parameters hierarchy path or a sequence of paths. Parameters found
+                     in the first paths take precedence over the ones found in the others.
+        :param bool recursive: Also fetch the parameters of nested hierarchies. Parameters
+                               closer to the given path take precedence.
+        :param int max_workers: Maximum number of paths fetched concurrently.
+        :param float ttl: Refresh the parameters (in a background thread) when they are
+                          older than the given number of seconds. Stale parameters are
+                          used while they're refreshed or if the refresh fails.
+        :param function on_refresh: Called after every fetch with the loader, the fetch
+                                    duration in seconds and the exception raised by the
+                                    fetch (or ``None``).
+        """
+        if not _import_boto3():
             raise RuntimeError(
                 'AwsParameterStore requires [aws] feature. Please install it: "pip install prettyconf[aws]"'
             )
 
         self.path = path
+        self.paths = (path,) if isinstance(path, str) else tuple(path)
         self.aws_access_key_id = aws_access_key_id
         self.aws_secret_access_key = aws_secret_access_key
         self.region_name = region_name
         self.endpoint_url = endpoint_url
+        self.recursive = recursive
+        self.max_workers = max_workers
+        self.ttl = ttl
+        self.on_refresh = on_refresh
+        self._client = None
         self._fetched = False
+        self._fetched_at = None
+        self._fetch_lock = threading.Lock()
         self._parameters = {}
+        self._parameter_names = {}  # parameter -> full parameter name (with its path)
+        self._refresh_lock = threading.Lock()
+        self._refresh_thread = None
+        reset_after_fork(self)
+
+    def _after_fork_in_child(self):
+        # the parent's locks may be held by threads (eg. a refresh) that don't exist
+        # in the child and boto3 clients must not be shared between processes
+        self._fetch_lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._refresh_thread = None
+        self._client = None
+
+    def _get_client(self):
+        if self._client is None:
+            self._client = boto3.client(
+                service_name='ssm',
+                aws_access_key_id=self.aws_access_key_id,
+                aws_secret_access_key=self.aws_secret_access_key,
+                region_name=self.region_name,
+                endpoint_url=self.endpoint_url,
+            )
+        return self._client
 
-    def _store_parameters(self, parameters):
+    def _fetch_path(self, client, path):
+        kwargs = {'Path': path}
+        if self.recursive:
+            kwargs['Recursive'] = True
+
+        response = client.get_parameters_by_path(**kwargs)
+        parameters = list(response['Parameters'])
+        while response.get('NextToken'):
+            response = client.get_parameters_by_path(NextToken=response['NextToken'], **kwargs)
+            parameters += response['Parameters']
+
+        # parameters from shallower hierarchies first
+        parameters.sort(key=lambda parameter: (parameter['Name'].count('/'), parameter['Name']))
+
+        path_parameters = {}
         for parameter in parameters:
-            self._parameters[parameter['Name'].split('/')[-1]] = parameter['Value']
+            path_parameters.setdefault(parameter['Name'].split('/')[-1], parameter)
+        return path_parameters
+
+    def _fetch_all_paths(self):
+        client = self._get_client()
+        if len(self.paths) == 1:
+            results = [self._fetch_path(client, self.paths[0])]
+        else:
+            from concurrent.futures import ThreadPoolExecutor  # only needed to fetch many paths
+
+            # boto3 clients are thread safe
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(self.paths))) as executor:
+                results = list(executor.map(functools.partial(self._fetch_path, client), self.paths))
+
+        parameters = {}
+        for path_parameters in reversed(results):
+            parameters.update(path_parameters)
+        return parameters
+
+    def _load_parameters(self):
+        error = None
+        start = time.monotonic()
+        try:
+            parameters = self._fetch_all_paths()
+        except Exception as ex:
+            error = ex
+            raise
+        finally:
+            self._fetched_at = time.monotonic()
+            if self.on_refresh:
+                self.on_refresh(self, self._fetched_at - start, error)
+
+        self._notify_load(self._fetched_at - start)
+        return parameters
+
+    def _store_parameters(self, parameters):
+        """
+        Store the fetched parameters. Returns ``True`` if any value changed.
+        """
+        values = {name: parameter['Value'] for name, parameter in parameters.items()}
+        self._parameter_names = {name: parameter['Name'] for name, parameter in parameters.items()}
+        changed = values != self._parameters
+        self._parameters = values
+        return changed
 
     def _fetch_parameters(self):
         if self._fetched:
             return
 
-        client = boto3.client(
-            service_name='ssm',
-            aws_access_key_id=self.aws_access_key_id,
-            aws_secret_access_key=self.aws_secret_access_key,
-            region_name=self.region_name,
-            endpoint_url=self.endpoint_url,
-        )
+        with self._fetch_lock:
+            if self._fetched:  # fetched by another thread while we waited
+                return
 
-        response = client.get_parameters_by_path(Path=self.path)
-        next_token = response.get('NextToken')
-        self._store_parameters(response['Parameters'])
+            self._store_parameters(self._load_parameters())
+            self._fetched = True
 
-        while next_token:
-            response = client.get_parameters_by_path(Path=self.path, NextToken=next_token)
-            next_token = response.get('NextToken')
-            self._store_parameters(response['Parameters'])
+    def _refresh_parameters(self):
+        try:
+            if self._store_parameters(self._load_parameters()):
+                self.notify_reload()
+        except (botocore.exceptions.BotoCoreError, botocore.exceptions.ClientError):
+            pass  # keep using stale parameters until the next refresh
+        finally:
+            self._refresh_thread = None
+
+    def _refresh_expired_parameters(self):
+        if self.ttl is None or time.monotonic() - self._fetched_at < self.ttl:
+            return
 
-        self._fetched = True
+        with self._refresh_lock:
+            if self._refresh_thread is not None:
+                return
+
+            self._refresh_thread = threading.Thread(
+                target=self._refresh_parameters,
+                name=f'{self.__class__.__name__}-refresh',
+                daemon=True,
+            )
+            self._refresh_thread.start()
 
     def check(self):
         try:
@@ -364,11 +1127,65 @@ class AwsParameterStore(AbstractConfigurationLoader):
         except (botocore.exceptions.BotoCoreError, botocore.exceptions.ClientError):
             return False
 
+        self._refresh_expired_parameters()
         return super().check()
 
+    def _snapshot_state(self):
+        # without a ttl the parameters would never expire: always fetch them
+        if self.ttl is None or not self.check():
+            return None
+
+        state = {
+            'paths': list(self.paths),
+            'recursive': self.recursive,
+            'region_name': self.region_name,
+            'parameters': self._parameters,
+            'names': self._parameter_names,
+            # wall clock time (monotonic clocks can't be compared between processes)
+            'fetched_at': time.time() - (time.monotonic() - self._fetched_at),
+        }
+        return state, []
+
+    def _prepare_snapshot_restore(self, state):
+        if (state['paths'], state['recursive'], state['region_name']) != (
+            list(self.paths),
+            self.recursive,
+            self.region_name,
+        ):
+            return None
+
+        age = time.time() - state['fetched_at']
+        if self.ttl is None or not 0 <= age < self.ttl:
+            return None
+
+        parameters, names = dict(state['parameters']), dict(state['names'])
+
+        def restore():
+            self._parameters, self._parameter_names = parameters, names
+            self._fetched_at = time.monotonic() - age  # refreshed when they were going to be
+            self._fetched = True
+
+        return restore
+
     def __repr__(self):
         return f'AwsParameterStore(path={self.path} region={self.region_name})'
 
+    def explain(self, item):
+        if not self.check():
+            return []
+
+        parameters, names = self._parameters, self._parameter_names  # may be replaced by a refresh
+        if item not in parameters:
+            return []
+
+        return [Origin(self, names.get(item), parameters[item])]
+
+    def provenance(self):
+        if not self.check():
+            return {}
+
+        return {item: self.explain(item) for item in self._parameters}
+
     def __contains__(self, item):
         if not self.check():
             return False
@@ -1,5 +1,8 @@
+import codecs
+import mmap
+import re
 from collections.abc import Iterator
-from typing import Union
+from typing import Optional, Union
 
 STATE_INITIAL = 'initial'
 STATE_PARSING_KEY = 'parsing_key'
@@ -13,6 +16,96 @@ ESCAPE_CHAR = '\\'
 SPACES = set(' \n')
 QUOTES = set('\'"')
 
+# Tokens of values without escapes: single quoted, double quoted, unquoted text,
+# inline comment and unbalanced quote.
+VALUE_TOKENS = re.compile(r"""'([^']*)'|"([^"]*)"|([^'"#]+)|#(.*)|(['"])""", re.DOTALL)
+TOKEN_UNQUOTED = 3
+TOKEN_COMMENT = 4
+TOKEN_UNBALANCED_QUOTE = 5
+
+
+# Any byte that is not an ASCII character (searched in the mapped buffer).
+NON_ASCII = re.compile(rb'[\x80-\xff]')
+ASCII_WINDOW_SIZE = 64 * 1024  # bytes of pure ASCII lines decoded at once
+
+# Simple lines matched directly in the (bytes) buffer: blank lines, comments and
+# unquoted KEY=value lines without escapes.
+SIMPLE_LINE = re.compile(rb"""[ ]*(?:([^\s#='"\\][^\r\n#='"\\]*)=[ ]*([^\r\n#'"\\]*))?(?:#[^\r\n'"]*)?\r?\n""")
+
+
+def is_ascii_compatible(encoding):
+    """
+    Check if ``encoding`` represents ASCII characters with the same single bytes
+    (and never uses those bytes inside multibyte characters).
+    """
+    name = codecs.lookup(encoding).name
+    return name in ('ascii', 'utf-8') or name.startswith(('iso8859-', 'cp125', 'mac-'))
+
+
+def _has_quotes(text):
+    return "'" in text or '"' in text
+
+
+def _parse_simple_line(line):
+    """
+    Parse a complete line (without its ``END_OF_LINE``) without going through the
+    character-level state machine.
+
+    Returns the ``(key, value)`` tuple found in the line, ``None`` for lines that
+    do not contain configurations or ``NotImplemented`` for lines with escapes,
+    multi-line values, or quotes that change the parser state beyond the line.
+    Those must go through the state machine.
+    """
+    if ESCAPE_CHAR in line:
+        return NotImplemented
+
+    line = line.lstrip(' ')
+    if not line:
+        return None
+
+    if line[0] == COMMENT:
+        return NotImplemented if _has_quotes(line) else None
+
+    # first character always belongs to the key, even if it's a '='
+    separator = line.find('=', 1)
+    if separator == -1:
+        return NotImplemented if _has_quotes(line) else None
+
+    key = line[:separator]
+    if _has_quotes(key):
+        return NotImplemented
+
+    if COMMENT in key:
+        return NotImplemented if _has_quotes(line) else None
+
+    value = line[separator + 1 :]
+    if COMMENT not in value and not _has_quotes(value):  # unquoted value
+        return key.rstrip(), value.lstrip(' ').rstrip()
+
+    value = []
+    value_started = False
+    for token in VALUE_TOKENS.finditer(line, separator + 1):
+        kind = token.lastindex
+        text = token.group(kind)
+
+        if kind == TOKEN_UNBALANCED_QUOTE:
+            return NotImplemented
+
+        if kind == TOKEN_COMMENT:
+            if _has_quotes(text):
+                return NotImplemented
+            break
+
+        if kind == TOKEN_UNQUOTED and not value_started:
+            # spaces before the value are ignored
+            text = text.lstrip(' ')
+
+        if text:
+            value.append(text)
+            value_started = True
+
+    return key.rstrip(), ''.join(value).rstrip()
+
 
 class BufferedStreamReader:
     BUFFER_SIZE = 1024
@@ -32,6 +125,33 @@ class BufferedStreamReader:
         self.position += 1
         return char
 
+    def read_line(self):
+        """
+        Read the stream up to (and including) the next ``END_OF_LINE``. Returns an
+        empty string when the stream is depleted.
+        """
+        chunks = []
+        while True:
+            if self._is_buffer_depleted():
+                self._fill_buffer()
+                if not self.buffer:
+                    break
+
+            end = self.buffer.find(END_OF_LINE, self.position) + 1
+            if end:
+                chunks.append(self.buffer[self.position : end])
+                self.position = end
+                break
+
+            chunks.append(self.buffer[self.position :])
+            self.position = len(self.buffer)
+
+        return ''.join(chunks)
+
+    def read_configs(self):
+        # Text streams are parsed line by line
+        return ()
+
     def _is_buffer_depleted(self):
         return self.position >= len(self.buffer)
 
@@ -40,53 +160,271 @@ class BufferedStreamReader:
         self.position = 0
 
 
+class MappedFileReader:
+    """
+    Reads a memory mapped file. Simple lines are matched in place and only the
+    key and value slices are decoded. Other lines are decoded (with newlines
+    normalized as in text mode files) and returned by ``read_line()``.
+
+    Pure ASCII files (decoded the same way by every ASCII compatible encoding)
+    are decoded in windows of complete lines (see ``ASCII_WINDOW_SIZE``) and
+    parsed as text instead, without decoding the whole file at once.
+
+    Truncating a memory mapped file while it's read kills the process (with a
+    ``SIGBUS`` signal on POSIX systems), so files that may be rewritten in place
+    while they're parsed must be read with ``mapped=False``.
+    """
+
+    def __init__(self, file, encoding, mapped=True):
+        """
+        :param file: A file object opened in binary mode.
+        :param str encoding: An ASCII compatible encoding (see ``is_ascii_compatible``).
+        :param bool mapped: Map the file in memory instead of reading it into a
+                            ``bytes`` buffer (matched the same way).
+        """
+        self.encoding = encoding
+        self.position = 0
+        self._lines = []
+
+        self.buffer = None
+        if mapped:
+            try:
+                self.buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            except (ValueError, OSError):  # empty files, pipes, etc.
+                pass
+        if self.buffer is None:
+            self.buffer = file.read()
+
+        self._ascii = NON_ASCII.search(self.buffer) is None  # searched in place, without copying the file
+        self._window = []  # decoded lines of pure ASCII files (see ASCII_WINDOW_SIZE)
+        self._window_index = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if isinstance(self.buffer, mmap.mmap):
+            self.buffer.close()
+
+    def read_configs(self):
+        """
+        Read the simple lines (see ``SIMPLE_LINE``) that follow. Returns a list with
+        the ``(key, value)`` tuple found in each line (``None`` for lines that do
+        not contain configurations). The next line must be read with ``read_line()``.
+        """
+        if self._lines:
+            return ()
+
+        if self._ascii:
+            return self._read_ascii_configs()
+
+        configs = []
+        buffer, position, encoding = self.buffer, self.position, self.encoding
+        while match := SIMPLE_LINE.match(buffer, position):
+            position = match.end()
+            key, value = match.group(1, 2)
+            configs.append(None if key is None else (key.decode(encoding).rstrip(), value.decode(encoding).rstrip()))
+
+        self.position = position
+        return configs
+
+    def _read_ascii_configs(self):
+        configs = []
+        while self._window_index < len(self._window) or self._decode_ascii_window():
+            window, index = self._window, self._window_index
+            while index < len(window):
+                line = window[index]
+                if line.endswith('\r'):
+                    line = line[:-1]
+
+                parsed_value = NotImplemented if '\r' in line else _parse_simple_line(line)
+                if parsed_value is NotImplemented:  # old Mac newlines are normalized by read_line()
+                    self._window_index = index
+                    return configs
+
+                configs.append(parsed_value)
+                index += 1
+
+            self._window_index = index
+
+        return configs
+
+    def _decode_ascii_window(self):
+        # decode the complete lines within the next window (or the next line, if longer) at once
+        position = self.position
+        end = self.buffer.rfind(b'\n', position, position + ASCII_WINDOW_SIZE)
+        if end == -1:
+            end = self.buffer.find(b'\n', position)
+            if end == -1:
+                return False
+
+        self._window = self.buffer[position:end].decode('ascii').split(END_OF_LINE)
+        self._window_index = 0
+        self.position = end + 1
+        return True
+
+    def read_line(self):
+        if self._lines:
+            return self._lines.pop()
+
+        if self._ascii and (self._window_index < len(self._window) or self._decode_ascii_window()):
+            line = self._window[self._window_index] + END_OF_LINE
+            self._window_index += 1
+        else:
+            end = self.buffer.find(b'\n', self.position) + 1 or len(self.buffer)
+            line = self.buffer[self.position : end].decode(self.encoding)
+            self.position = end
+
+        if '\r' in line:
+            lines = line.replace('\r\n', END_OF_LINE).replace('\r', END_OF_LINE).splitlines(keepends=True)
+            line = lines.pop(0)
+            self._lines = lines[::-1]
+
+        return line
+
+
 class EnvFileParser:
-    def __init__(self, stream):
+    def __init__(self, stream=None, encoding='utf-8'):
+        """
+        :param stream: A text stream or a ``MappedFileReader``. Not needed when the
+                       content is given through ``feed()``.
+        :param str encoding: Encoding of the ``bytes`` chunks given to ``feed()``.
+        """
         self.state = STATE_INITIAL
-        self._stream = BufferedStreamReader(stream)
+        if stream is None or isinstance(stream, MappedFileReader):
+            self._stream = stream
+        else:
+            self._stream = BufferedStreamReader(stream)
+
+        self.encoding = encoding
+        self._decoder = None
+        self._pending = []  # chunks of the line not completely fed yet
 
         self._current_key = []
         self._current_value = []
         self._current_quote = ''
         self._key_parsed = False
+        self._key_line = None
+        self.line_number = 0  # lines read so far
+        self.config_line = None  # line where the last configuration returned starts
 
     def parse_config(self) -> Iterator[tuple[str, str]]:
-        key = self._current_key
-        value = self._current_value
-
         while True:
-            char = self._stream.read_char()
-            if not char:
-                if key or value:
-                    yield self._return_current_config()
+            if self.state == STATE_INITIAL and not self._current_quote:
+                for parsed_value in self._stream.read_configs():
+                    self.line_number += 1
+                    if parsed_value:
+                        self.config_line = self.line_number
+                        yield parsed_value
+
+            line = self._stream.read_line()
+            if not line:
                 break
 
-            if self._process_initial(char):
-                continue
+            self.line_number += 1
+            yield from self._parse_line(line)
+
+        yield from self._parse_end()
+
+    def feed(self, chunk) -> list[tuple[str, str]]:
+        """
+        Parse a chunk of content (eg. read from a pipe or a socket) and return the
+        ``(key, value)`` tuples completed by it. Incomplete lines are kept until
+        the next chunks (or ``close()``) complete them.
+
+        :param chunk: A ``str`` chunk or a ``bytes`` chunk decoded with ``encoding``.
+        """
+        if isinstance(chunk, bytes):
+            if self._decoder is None:
+                self._decoder = codecs.getincrementaldecoder(self.encoding)()
+            chunk = self._decoder.decode(chunk)
+
+        end = chunk.rfind(END_OF_LINE) + 1
+        if not end:
+            self._pending.append(chunk)
+            return []
+
+        self._pending.append(chunk[:end])
+        text = ''.join(self._pending)
+        self._pending = [chunk[end:]]
+        return self._parse_text(text)
+
+    def close(self) -> list[tuple[str, str]]:
+        """
+        Finish parsing the content given to ``feed()`` (eg. a last line without a
+        line break) and return the ``(key, value)`` tuples completed.
+        """
+        if self._decoder is not None:
+            self._pending.append(self._decoder.decode(b'', final=True))
+
+        text = ''.join(self._pending)
+        self._pending = []
+        configs = self._parse_text(text)
+        configs += self._parse_end()
+        return configs
+
+    def _parse_text(self, text):
+        if '\r' in text:  # newlines normalized as in text mode files
+            text = text.replace('\r\n', END_OF_LINE).replace('\r', END_OF_LINE)
+
+        configs = []
+        lines = text.split(END_OF_LINE)
+        last_line = lines.pop()
+        for line in lines:
+            self.line_number += 1
+            configs += self._parse_line(line + END_OF_LINE)
+
+        if last_line:
+            self.line_number += 1
+            configs += self._parse_line(last_line)
+        return configs
+
+    def _parse_end(self) -> Iterator[tuple[str, str]]:
+        if self._current_key or self._current_value:
+            self.config_line = self._key_line
+            yield self._return_current_config()
+
+    def _parse_line(self, line) -> Iterator[tuple[str, str]]:
+        if self.state == STATE_INITIAL and not self._current_quote and line[-1] == END_OF_LINE:
+            parsed_value = _parse_simple_line(line[:-1])
+            if parsed_value is not NotImplemented:
+                if parsed_value:
+                    self.config_line = self.line_number
+                    yield parsed_value
+                return
 
-            if self._process_quotes(char):
-                continue
+        for char in line:
+            parsed_value = self._parse_char(char)
+            if parsed_value:
+                self.config_line = self._key_line
+                yield parsed_value
 
-            if self._start_comment(char):
-                continue
+    def _parse_char(self, char) -> Optional[tuple[str, str]]:
+        if self._process_initial(char):
+            return None
 
-            parsed_value = self._finish_comment(char)
-            if parsed_value:
-                if isinstance(parsed_value, tuple):
-                    yield parsed_value
-                continue
+        if self._process_quotes(char):
+            return None
 
-            if self._parse_key(char):
-                continue
+        if self._start_comment(char):
+            return None
 
-            parsed_value = self._parse_value(char)
-            if parsed_value:
-                if isinstance(parsed_value, tuple):
-                    yield parsed_value
-                continue
+        parsed_value = self._finish_comment(char)
+        if parsed_value:
+            return parsed_value if isinstance(parsed_value, tuple) else None
+
+        if self._parse_key(char):
+            return None
+
+        parsed_value = self._parse_value(char)
+        if parsed_value:
+            return parsed_value if isinstance(parsed_value, tuple) else None
 
-            if self._parse_escaped_value(char):
-                continue
+        self._parse_escaped_value(char)
+        return None
 
     def _start_comment(self, char):
         if char == COMMENT and (not self._current_quote or self.state == STATE_INITIAL):
@@ -131,6 +469,7 @@ class EnvFileParser:
             return True
 
         self._current_key.append(char)
+        self._key_line = self.line_number
         self.state = STATE_PARSING_KEY
         return True
 
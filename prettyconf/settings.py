@@ -0,0 +1,101 @@
+import os
+import sys
+
+from . import config as default_config
+from .exceptions import InvalidSettings, UnknownConfiguration
+
+_NO_DEFAULT = object()
+
+
+class Field:
+    def __init__(self, cast=lambda v: v, default=_NO_DEFAULT, name=None):
+        """
+        :param function cast: A function to cast the configuration value.
+        :param default: The value used when the configuration is not found.
+        :param str name: The configuration name. Defaults to the attribute name.
+        """
+        if not callable(cast):
+            raise TypeError('Cast must be callable')
+
+        self.cast = cast
+        self.default = default
+        self.name = name
+
+    def __repr__(self):
+        return f'Field(name={self.name!r})'
+
+
+class SettingsMeta(type):
+    def __new__(mcs, name, bases, namespace):
+        fields = {}
+        for base in reversed(bases):
+            fields.update(getattr(base, '_fields', {}))
+
+        new_fields = {attribute: value for attribute, value in namespace.items() if isinstance(value, Field)}
+        for attribute, field in new_fields.items():
+            del namespace[attribute]
+            if field.name is None:
+                field.name = attribute
+
+        namespace['__slots__'] = tuple(attribute for attribute in new_fields if attribute not in fields)
+        namespace['_fields'] = {**fields, **new_fields}
+        return super().__new__(mcs, name, bases, namespace)
+
+
+class Settings(metaclass=SettingsMeta):
+    """
+    Declare settings as class attributes and resolve all of them at once when
+    instantiated. All missing or invalid configurations are reported together
+    in an ``InvalidSettings`` exception.
+
+    Example::
+        class AppSettings(Settings):
+            debug = Field(cast=config.boolean, default=False)
+            database_url = Field(name='DATABASE_URL')
+            allowed_hosts = Field(cast=config.list, default='localhost')
+
+        settings = AppSettings()
+        settings.debug
+    """
+
+    def __init__(self, config=None):
+        """
+        :param Configuration config: The configuration used to resolve settings.
+                                     Defaults to ``prettyconf.config``.
+        """
+        if config is None:
+            config = default_config
+
+        fields = self._fields
+        names = [field.name for field in fields.values()]
+        values = config._lookup_many(names, starting_path=self._module_path())
+
+        errors = {}
+        for attribute, field in fields.items():
+            try:
+                value = values[field.name]
+            except KeyError:
+                if field.default is _NO_DEFAULT:
+                    errors[field.name] = UnknownConfiguration(f"Configuration '{field.name}' not found")
+                    continue
+                value = field.default
+
+            try:
+                object.__setattr__(self, attribute, field.cast(value))
+            except Exception as ex:
+                errors[field.name] = ex
+
+        if errors:
+            raise InvalidSettings(errors)
+
+    @classmethod
+    def _module_path(cls):
+        # configuration files are discovered from the module declaring the settings
+        filename = getattr(sys.modules.get(cls.__module__), '__file__', None)
+        return filename and os.path.dirname(os.path.abspath(filename))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f'{self.__class__.__name__} is read-only')
+
+    def __delattr__(self, name):
+        raise AttributeError(f'{self.__class__.__name__} is read-only')
@@ -0,0 +1,143 @@
+"""
+Snapshots of the configurations loaded by a loaders chain.
+
+A snapshot file is laid out as::
+
+    MAGIC | header size (uint32, little-endian) | header | states
+
+Both ``header`` and ``states`` are serialized with ``marshal``. The header
+holds the loaders classes and the signatures (modification time and size) of
+every source file the states depend on, so a snapshot can be checked for
+freshness without deserializing the states. Saving the snapshot changes the
+modification time of its own directory, so that directory is signed by its
+entries (except the snapshot) instead. Snapshots are trusted files (like
+``.pyc`` files): never load snapshots from untrusted sources.
+"""
+
+import marshal
+import mmap
+import os
+import struct
+
+MAGIC = b'PRETTYCONF-SNAPSHOT\x02'
+HEADER_SIZE = struct.Struct('<I')
+
+
+def _snapshot_entry(filename):
+    directory, basename = os.path.split(os.path.abspath(filename))
+    return os.path.realpath(directory), basename
+
+
+def _signature(path, snapshot_entry):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    directory, basename = snapshot_entry
+    if path == directory:
+        # ignore the snapshot (and its temporary files, see write_snapshot())
+        return sorted(name for name in os.listdir(path) if name != basename and not name.startswith(f'.{basename}.'))
+
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _loader_names(loaders):
+    return [f'{type(loader).__module__}.{type(loader).__qualname__}' for loader in loaders]
+
+
+def write_snapshot(filename, loaders):
+    """
+    Save the configurations loaded by ``loaders`` to the ``filename`` snapshot.
+
+    :param str filename: Path to the snapshot file.
+    :param list loaders: The loaders chain.
+    """
+    snapshot_entry = _snapshot_entry(filename)
+    states = []
+    sources = {}
+    for loader in loaders:
+        snapshot = loader._snapshot_state() if hasattr(loader, '_snapshot_state') else None
+        if snapshot is None:
+            states.append(None)
+            continue
+
+        state, loader_sources = snapshot
+        states.append(state)
+        for source in loader_sources:
+            sources[source] = _signature(source, snapshot_entry)
+
+    header = marshal.dumps({'loaders': _loader_names(loaders), 'sources': list(sources.items())})
+    content = MAGIC + HEADER_SIZE.pack(len(header)) + header + marshal.dumps(states)
+
+    import tempfile  # only needed when saving snapshots
+
+    # replace the snapshot atomically (temporary files are only readable by the owner)
+    directory, basename = snapshot_entry
+    fd, temporary_filename = tempfile.mkstemp(dir=directory, prefix=f'.{basename}.')
+    try:
+        with os.fdopen(fd, 'wb') as snapshot_file:
+            snapshot_file.write(content)
+        os.replace(temporary_filename, filename)
+    except BaseException:
+        os.remove(temporary_filename)
+        raise
+
+
+def _read_states(filename, loaders):
+    with open(filename, 'rb') as snapshot_file, mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if mm[: len(MAGIC)] != MAGIC:
+            return None
+
+        header_start = len(MAGIC) + HEADER_SIZE.size
+        (header_size,) = HEADER_SIZE.unpack(mm[len(MAGIC) : header_start])
+        header_end = header_start + header_size
+
+        with memoryview(mm) as view, view[header_start:header_end] as header_view:
+            header = marshal.loads(header_view)
+
+        if header['loaders'] != _loader_names(loaders):
+            return None
+
+        snapshot_entry = _snapshot_entry(filename)
+        for source, signature in header['sources']:
+            if _signature(source, snapshot_entry) != signature:
+                return None
+
+        with memoryview(mm) as view, view[header_end:] as states_view:
+            return marshal.loads(states_view)
+
+
+def read_snapshot(filename, loaders):
+    """
+    Restore the configurations of ``loaders`` from the ``filename`` snapshot.
+
+    :param str filename: Path to the snapshot file.
+    :param list loaders: The loaders chain. It must match the chain used to save
+                         the snapshot.
+    :return: ``True`` if the snapshot was restored or ``False`` if it's missing,
+             invalid or stale.
+    """
+    try:
+        states = _read_states(filename, loaders)
+    except (OSError, ValueError, EOFError, TypeError, KeyError, struct.error):
+        return False
+
+    if states is None or len(states) != len(loaders):
+        return False
+
+    # check every state before restoring any, so a rejected snapshot leaves the loaders untouched
+    restores = []
+    for loader, state in zip(loaders, states):
+        if state is None:
+            continue
+
+        restore = loader._prepare_snapshot_restore(state)
+        if restore is None:
+            return False
+        restores.append(restore)
+
+    for restore in restores:
+        restore()
+
+    return True
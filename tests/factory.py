@@ -1,4 +1,5 @@
 import argparse
+import threading
 
 from prettyconf import NOT_SET
 
@@ -8,3 +9,30 @@ def parser_factory():
     parser.add_argument('--var', '-v', dest='var', default=NOT_SET, help='set var')
     parser.add_argument('--var2', '-b', dest='var2', default='foo', help='set var2')
     return parser
+
+
+def run_concurrently(function, threads=16):
+    """
+    Calls ``function`` from many threads started at the same time. Returns the
+    results (re-raising the first exception raised).
+    """
+    barrier = threading.Barrier(threads)
+    results = [None] * threads
+    errors = []
+
+    def target(index):
+        barrier.wait()
+        try:
+            results[index] = function()
+        except Exception as ex:
+            errors.append(ex)
+
+    workers = [threading.Thread(target=target, args=(index,)) for index in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=10)
+
+    if errors:
+        raise errors[0]
+    return results
@@ -1,3 +1,5 @@
+import json
+
 import pytest
 
 from prettyconf import config
@@ -83,6 +85,28 @@ def test_basic_tuple_cast():
     assert tuple_cast('foo, \'"bar", baz  \', qux # doo ') == ('foo', '\'"bar", baz  \'', 'qux # doo')
 
 
+def test_list_cast_without_quotes():
+    list_cast = List(delimiter=';')
+
+    assert list_cast('') == []
+    assert list_cast('foo') == ['foo']
+    assert list_cast('foo;bar;') == ['foo', 'bar']
+    assert list_cast(';foo; ') == ['', 'foo', '']
+    assert list_cast('foo, bar;baz') == ['foo, bar', 'baz']
+
+
+def test_list_cast_items():
+    assert List(item_cast=int)('8000, 8001,8002') == [8000, 8001, 8002]
+    assert Tuple(item_cast=int)('8000, 8001') == (8000, 8001)
+    assert List(item_cast=Boolean())('on, off') == [True, False]
+    assert List(item_cast=json.loads)('"foo", "bar, baz"') == ['foo', 'bar, baz']
+
+
+def test_fail_invalid_list_item_cast():
+    with pytest.raises(InvalidConfiguration):
+        List(item_cast=int)('8000, foo')
+
+
 def test_options():
     choices = {
         'option1': 'asd',
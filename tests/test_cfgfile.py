@@ -1,6 +1,13 @@
+import time
+from configparser import BasicInterpolation, ConfigParser, InterpolationMissingOptionError
+from unittest import mock
+
 import pytest
 
-from prettyconf.loaders import IniFile
+from prettyconf.configuration import Configuration
+from prettyconf.loaders import Environment, IniFile, Origin
+
+from .factory import run_concurrently
 
 
 def test_basic_config_object(inifile):
@@ -68,3 +75,105 @@ def test_fail_missing_envfile_get_item():
     config = IniFile('does-not-exist.ini')
     with pytest.raises(KeyError):
         return config['error']
+
+
+def test_reload_changed_ini_file(tmp_path):
+    filename = tmp_path / 'settings.ini'
+    filename.write_text('[settings]\nkey=value\n')
+    config = IniFile(str(filename), reload_interval=0)
+    reloaded = mock.Mock()
+    config.add_reload_listener(reloaded)
+
+    assert config['key'] == 'value'
+
+    filename.write_text('[settings]\nkey=new value\n')
+    assert config['key'] == 'new value'
+    reloaded.assert_called_once_with(config)
+
+
+def test_reload_ini_file_without_settings_section(tmp_path):
+    filename = tmp_path / 'settings.ini'
+    filename.write_text('[settings]\nkey=value\n')
+    config = IniFile(str(filename), reload_interval=0)
+    assert config['key'] == 'value'
+
+    filename.write_text('[other]\nkey=value\n')
+    assert 'key' not in config
+
+
+def test_explain(inifile):
+    config = IniFile(inifile)
+
+    assert config.explain('HASH_CONTENT') == [Origin(config, f'{inifile} [settings]', "Foo 'Bar # Baz' Value")]
+    assert config.explain('COMMENTED_KEY') == []
+    assert config.provenance()['key'] == [Origin(config, f'{inifile} [settings]', 'Value')]
+    assert IniFile('does-not-exist.ini').provenance() == {}
+
+
+def test_explain_interpolation_errors(tmp_path, monkeypatch):
+    inifile = tmp_path / 'settings.ini'
+    inifile.write_text('[settings]\nbroken=%(unknown)s\n')
+    monkeypatch.setenv('BROKEN', 'value')
+    config = Configuration(loaders=[Environment(), IniFile(str(inifile))])
+
+    environment_origin, inifile_origin = config.provenance()['broken']  # doesn't raise
+    assert environment_origin.value == 'value'
+    assert inifile_origin.location == f'{inifile} [settings]'
+    assert isinstance(inifile_origin.value, InterpolationMissingOptionError)
+    assert config.explain('BROKEN') == [environment_origin, inifile_origin]
+
+
+def test_ini_file_is_parsed_once_by_concurrent_lookups(inifile):
+    config = IniFile(inifile)
+    read_file = ConfigParser.read_file
+
+    def slow_read_file(parser, *args, **kwargs):
+        time.sleep(0.05)  # let the other threads find the file not parsed yet
+        return read_file(parser, *args, **kwargs)
+
+    with mock.patch.object(ConfigParser, 'read_file', autospec=True, side_effect=slow_read_file) as parse:
+        results = run_concurrently(lambda: config['KEY'])
+
+    assert results == ['Value'] * len(results)
+    assert parse.call_count == 1
+
+
+INTERPOLATED_CONTENT = """
+[DEFAULT]
+base=/srv
+[settings]
+path=%(base)s/app
+broken=%(unknown)s
+[other]
+ignored=%(missing)s
+"""
+
+
+def test_options_are_interpolated_once(tmp_path):
+    filename = tmp_path / 'settings.ini'
+    filename.write_text(INTERPOLATED_CONTENT)
+    config = IniFile(str(filename))
+    config.check()
+
+    with mock.patch.object(BasicInterpolation, 'before_get') as interpolate:
+        for _ in range(3):
+            assert config['PATH'] == '/srv/app'
+            assert config['base'] == '/srv'
+            assert 'ignored' not in config
+
+    interpolate.assert_not_called()
+    assert config.configs == {'path': '/srv/app', 'base': '/srv'}
+
+
+def test_interpolation_errors_are_raised_on_lookup(tmp_path):
+    filename = tmp_path / 'settings.ini'
+    filename.write_text(INTERPOLATED_CONTENT)
+    config = IniFile(str(filename))
+
+    assert config['path'] == '/srv/app'
+    assert 'broken' in config
+    for _ in range(2):
+        with pytest.raises(InterpolationMissingOptionError):
+            config['broken']
+    assert list(config.provenance()) == ['path', 'base', 'broken']
+    assert isinstance(config.explain('broken')[0].value, InterpolationMissingOptionError)
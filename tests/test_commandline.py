@@ -1,6 +1,6 @@
 import pytest
 
-from prettyconf.loaders import CommandLine
+from prettyconf.loaders import CommandLine, Origin
 
 from .factory import parser_factory
 
@@ -35,3 +35,9 @@ def test_does_not_ignore_set_values():
 
 def test_contains_missing_keys(command_line_config):
     assert 'var3' not in command_line_config
+
+
+def test_explain(command_line_config):
+    assert command_line_config.explain('var2') == [Origin(command_line_config, 'command line', 'foo')]
+    assert command_line_config.explain('unknown') == []
+    assert command_line_config.provenance()['var2'] == command_line_config.explain('var2')
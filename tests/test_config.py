@@ -1,10 +1,17 @@
+import importlib.util
+import itertools
 import os
+import signal
+from unittest import mock
 
 import pytest
 
 from prettyconf.configuration import Configuration
 from prettyconf.exceptions import UnknownConfiguration
-from prettyconf.loaders import EnvFile, Environment, IniFile
+from prettyconf.instrumentation import Observer
+from prettyconf.loaders import AbstractConfigurationLoader, EnvFile, Environment, IniFile, Origin, RecursiveSearch
+
+from .factory import run_concurrently
 
 
 def test_basic_config(env_config, ini_config):
@@ -66,3 +73,417 @@ def test_fail_unknown_config_without_default_value():
 def test_none_as_default_value():
     config = Configuration()
     assert config('UNKNOWN', default=None) is None
+
+
+class CountingLoader(AbstractConfigurationLoader):
+    def __init__(self, configs):
+        self.configs = configs
+        self.lookups = 0
+
+    def __repr__(self):
+        return 'CountingLoader()'
+
+    def __contains__(self, item):
+        return item in self.configs
+
+    def __getitem__(self, item):
+        self.lookups += 1
+        return self.configs[item]
+
+
+def test_cache_disabled_by_default():
+    loader = CountingLoader({'KEY': '1'})
+    config = Configuration(loaders=[loader])
+
+    assert config('KEY', cast=int) == 1
+    assert config('KEY', cast=int) == 1
+    assert loader.lookups == 2
+
+
+def test_cache_resolved_values():
+    loader = CountingLoader({'KEY': '1'})
+    config = Configuration(loaders=[loader], cache=True)
+
+    assert config('KEY', cast=int) == 1
+    assert config('KEY', cast=int) == 1
+    assert loader.lookups == 1
+
+    assert config('KEY') == '1'
+    assert loader.lookups == 2
+
+
+def test_cache_default_values_by_type():
+    config = Configuration(loaders=[CountingLoader({})], cache=True)
+
+    assert config('UNKNOWN', cast=str, default=1) == '1'
+    assert config('UNKNOWN', cast=str, default=True) == 'True'
+    with pytest.raises(UnknownConfiguration):
+        config('UNKNOWN', cast=str)
+
+
+def test_cache_skip_unhashable_default_values():
+    config = Configuration(loaders=[CountingLoader({})], cache=True)
+
+    assert config('UNKNOWN', default=['a']) == ['a']
+    assert config._cache == {}
+
+
+def test_cache_size():
+    loader = CountingLoader({'KEY': '1'})
+    config = Configuration(loaders=[loader], cache=True, cache_size=2)
+
+    for _ in range(10):
+        assert config('KEY', cast=int) == 1
+        assert config('KEY', cast=lambda value: value) == '1'  # a new cast on every call
+
+    assert len(config._cache) == 2
+    assert loader.lookups == 11  # the value casted with int is used, so it's kept
+
+
+class ReloadingLoader(CountingLoader):
+    def __getitem__(self, item):
+        value = super().__getitem__(item)
+        if value == 'old':  # reloaded (eg. by a refresh thread) right after the value was read
+            self.configs[item] = 'new'
+            self.notify_reload()
+        return value
+
+
+def test_cache_skip_values_resolved_before_a_reload():
+    config = Configuration(loaders=[ReloadingLoader({'KEY': 'old'})], cache=True)
+
+    assert config('KEY') == 'old'
+    assert config('KEY') == 'new'
+    assert [value for value, _ in config._cache.values()] == ['new']
+
+
+def test_cache_invalidation():
+    loader = CountingLoader({'KEY': '1', 'OTHER': '2'})
+    config = Configuration(loaders=[loader], cache=True)
+    config('KEY')
+    config('OTHER')
+
+    config.invalidate('KEY')
+    loader.configs['KEY'] = loader.configs['OTHER'] = '3'
+    assert config('KEY') == '3'
+    assert config('OTHER') == '2'
+
+    config.invalidate()
+    assert config('OTHER') == '3'
+
+
+def test_cache_invalidation_on_loader_reload():
+    loader = CountingLoader({'KEY': '1'})
+    config = Configuration(loaders=[loader], cache=True)
+    assert config('KEY') == '1'
+
+    loader.configs['KEY'] = '2'
+    loader.notify_reload()
+    assert config('KEY') == '2'
+
+
+def test_cache_stop_listening_replaced_loaders():
+    loader = CountingLoader({'KEY': '1'})
+    config = Configuration(loaders=[loader], cache=True)
+
+    config.loaders = [CountingLoader({'KEY': '2'})]
+    assert loader._reload_listeners == ()
+    assert config('KEY') == '2'
+
+
+def _looked_up_paths(lookup):
+    return {os.path.realpath(call.args[2]) for call in lookup.call_args_list}
+
+
+def test_config_detects_caller_path():
+    config = Configuration()
+    with mock.patch.object(RecursiveSearch, 'lookup', autospec=True, side_effect=KeyError) as lookup:
+        config('UNKNOWN', default=None)
+
+    assert _looked_up_paths(lookup) == {os.path.dirname(os.path.realpath(__file__))}
+
+
+def test_pin_starting_path(files_path):
+    config = Configuration()
+    config.pin_starting_path(files_path)
+
+    with mock.patch('prettyconf.configuration._caller_path') as caller_path:
+        config('UNKNOWN', default=None)
+
+    caller_path.assert_not_called()
+    assert config._recursive_search.starting_path == os.path.realpath(files_path)
+
+
+def test_pin_starting_path_to_caller_path():
+    config = Configuration()
+    config.pin_starting_path()
+
+    assert config._recursive_search.starting_path == os.path.dirname(os.path.realpath(__file__))
+
+
+def test_pin_starting_path_without_recursive_search():
+    config = Configuration(loaders=[Environment()])
+    config.pin_starting_path('/')
+
+    assert config('UNKNOWN', default=None) is None
+
+
+def test_many():
+    loader = CountingLoader({'INTEGER': '42', 'BOOLEAN': 'yes'})
+    config = Configuration(loaders=[Environment(var_format=lambda x: f'PRETTYCONF_TEST_{x}'), loader])
+
+    values = config.many(
+        {'INTEGER': int, 'BOOLEAN': config.boolean, 'LIST': config.list},
+        defaults={'LIST': 'a,b', 'BOOLEAN': 'no'},
+    )
+
+    assert values == {'INTEGER': 42, 'BOOLEAN': True, 'LIST': ['a', 'b']}
+    assert loader.lookups == 3
+
+
+def test_many_stops_at_last_needed_loader():
+    first, second = CountingLoader({'FIRST': '1', 'SECOND': '2'}), CountingLoader({})
+    config = Configuration(loaders=[first, second])
+
+    assert config.many({'FIRST': int, 'SECOND': int}) == {'FIRST': 1, 'SECOND': 2}
+    assert second.lookups == 0
+
+
+def test_many_reports_all_missing_configurations():
+    config = Configuration(loaders=[CountingLoader({'FOUND': '1'})])
+
+    with pytest.raises(UnknownConfiguration) as exc_info:
+        config.many({'FOUND': int, 'FIRST': int, 'SECOND': str}, defaults={'SECOND': 'default'})
+
+    assert str(exc_info.value) == "Configurations not found: 'FIRST'"
+
+    with pytest.raises(UnknownConfiguration) as exc_info:
+        config.many({'FIRST': int, 'SECOND': str})
+
+    assert str(exc_info.value) == "Configurations not found: 'FIRST', 'SECOND'"
+
+
+def test_many_fail_invalid_cast_type():
+    config = Configuration(loaders=[CountingLoader({})])
+
+    with pytest.raises(TypeError):
+        config.many({'INTEGER': 'not callable'})
+
+
+def test_many_detects_caller_path():
+    config = Configuration()
+    with mock.patch.object(RecursiveSearch, 'lookup', autospec=True, side_effect=KeyError) as lookup:
+        config.many({'UNKNOWN': str}, defaults={'UNKNOWN': None})
+
+    assert _looked_up_paths(lookup) == {os.path.dirname(os.path.realpath(__file__))}
+
+
+def test_explain_shadowed_values(env_config, ini_config):
+    config = Configuration()
+
+    origins = config.explain('ENVFILE')
+
+    assert [(origin.location, origin.value) for origin in origins] == [
+        (f'{os.path.realpath(env_config)}:2', 'Environment File Value'),
+        (f'{os.path.realpath(ini_config)} [settings]', 'Must be overrided'),
+    ]
+    assert config.explain('UNKNOWN') == []
+
+
+def test_explain_loaders_without_location():
+    class DictLoader:
+        def __init__(self, configs):
+            self.configs = configs
+
+        def __getitem__(self, item):
+            return self.configs[item]
+
+    loader, other = CountingLoader({'KEY': '1'}), DictLoader({'KEY': '2'})
+    config = Configuration(loaders=[loader, other])
+
+    assert config.explain('KEY') == [Origin(loader, None, '1'), Origin(other, None, '2')]
+    assert config.provenance() == {}
+
+
+def test_provenance(env_config, ini_config, monkeypatch):
+    monkeypatch.setenv('ENVVAR', 'Environment Variable Value')
+    config = Configuration()
+
+    provenance = config.provenance()
+
+    assert [origin.value for origin in provenance['ENVVAR']] == ['Environment Variable Value', 'Must be overrided']
+    assert [origin.value for origin in provenance['inifile']] == ['INI File Value']  # ConfigParser lowercases names
+    assert provenance['ENVFILE'] == config.explain('ENVFILE')
+
+
+def test_cache_misses():
+    loader = CountingLoader({})
+    config = Configuration(loaders=[loader], cache_misses=True)
+
+    assert config('UNKNOWN', default=None) is None
+    assert config('UNKNOWN', cast=int, default='1') == 1
+    with pytest.raises(UnknownConfiguration):
+        config('UNKNOWN')
+    values = config.many({'UNKNOWN': int, 'OTHER': int}, defaults={'UNKNOWN': 2, 'OTHER': 3})
+    assert values == {'UNKNOWN': 2, 'OTHER': 3}
+    assert config.many({'OTHER': int}, defaults={'OTHER': 4}) == {'OTHER': 4}
+
+    assert loader.lookups == 2
+
+
+def test_cache_misses_disabled_by_default():
+    loader = CountingLoader({})
+    config = Configuration(loaders=[loader])
+
+    config('UNKNOWN', default=None)
+    config('UNKNOWN', default=None)
+
+    assert loader.lookups == 2
+    assert config._misses == set()
+
+
+def test_cache_misses_invalidation():
+    loader = CountingLoader({})
+    config = Configuration(loaders=[loader], cache_misses=True)
+    config('KEY', default=None)
+    config('OTHER', default=None)
+
+    loader.configs.update(KEY='1', OTHER='2')
+    config.invalidate('KEY')
+    assert config('KEY', default=None) == '1'
+    assert config('OTHER', default=None) is None
+
+    loader.notify_reload()
+    assert config('OTHER', default=None) == '2'
+
+
+class ReloadingMissesLoader(CountingLoader):
+    def __getitem__(self, item):
+        try:
+            return super().__getitem__(item)
+        finally:
+            if item not in self.configs:  # reloaded (eg. by a refresh thread) right after the miss
+                self.configs[item] = 'new'
+                self.notify_reload()
+
+
+@pytest.mark.parametrize('observed', [False, True])
+def test_cache_misses_skip_misses_looked_up_before_a_reload(observed):
+    config = Configuration(loaders=[ReloadingMissesLoader({})], cache_misses=True)
+    if observed:
+        config.add_observer(Observer())
+
+    assert config('KEY', default=None) is None
+    assert config.many({'OTHER': str}, defaults={'OTHER': 'default'}) == {'OTHER': 'default'}
+    assert config._misses == set()
+    assert config('KEY', default=None) == 'new'
+    assert config.many({'OTHER': str}) == {'OTHER': 'new'}
+
+
+def test_cache_misses_by_caller_path(files_path):
+    config = Configuration(cache_misses=True)
+
+    with mock.patch('prettyconf.configuration._caller_path', return_value=files_path):
+        assert config('UNKNOWN', default=None) is None
+    assert config('UNKNOWN', default=None) is None
+
+    assert {path for _, path in config._misses} == {files_path, os.path.dirname(os.path.abspath(__file__))}
+
+    config.pin_starting_path(files_path)
+    assert config._misses == set()
+
+
+def test_preload(env_config, ini_config):
+    envfile, inifile = EnvFile(env_config), IniFile(ini_config)
+    other = mock.Mock(spec=['check', '__contains__', '__getitem__'])
+    config = Configuration(loaders=[Environment(), envfile, inifile, other])
+
+    config.preload()
+
+    assert envfile._initialized
+    assert inifile._initialized
+    other.check.assert_called_once_with()
+
+
+def test_preload_discovers_config_files_from_caller_path():
+    config = Configuration()
+
+    config.preload()
+
+    assert os.path.dirname(os.path.realpath(__file__)) in config._recursive_search._config_files
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='requires fork()')
+def test_cache_lock_is_reset_after_fork():
+    config = Configuration(loaders=[CountingLoader({'KEY': '1'})], cache=True)
+    config._cache_lock.acquire()  # as if held by another thread while forking
+
+    pid = os.fork()
+    if pid == 0:  # child
+        status = 1
+        try:
+            signal.alarm(5)  # killed if the value can't be cached
+            if config('KEY') == '1':
+                status = 0
+        finally:
+            os._exit(status)
+
+    config._cache_lock.release()
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='requires fork()')
+def test_loaders_locks_are_reset_after_fork(env_config, ini_config):
+    envfile, inifile = EnvFile(env_config), IniFile(ini_config)
+    config = Configuration(loaders=[envfile, inifile])
+    config.preload()
+    locks = [envfile._load_lock, inifile._load_lock]
+    for lock in locks:
+        lock.acquire()  # as if held by another thread while forking
+
+    pid = os.fork()
+    if pid == 0:  # child
+        status = 1
+        try:
+            signal.alarm(5)  # killed if the files can't be parsed again
+            envfile._reset()
+            inifile._reset()
+            if (config('ENVFILE'), config('INIFILE')) == ('Environment File Value', 'INI File Value'):
+                status = 0
+        finally:
+            os._exit(status)
+
+    for lock in locks:
+        lock.release()
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+
+
+def _import_module(path, name):
+    filename = os.path.join(path, f'{name}.py')
+    with open(filename, 'w') as file_:
+        file_.write('def lookup(config):\n    return config("MODULE_KEY")\n')
+    spec = importlib.util.spec_from_file_location(name, filename)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_concurrent_lookups_from_different_caller_paths(create_dir):
+    modules = []
+    for name in ('first', 'second'):
+        _, path = create_dir(name)
+        with open(os.path.join(path, '.env'), 'w') as file_:
+            file_.write(f'MODULE_KEY={name}\n')
+        modules.append((name, _import_module(path, f'prettyconf_test_{name}')))
+
+    config = Configuration()
+    counter = itertools.count()
+
+    def lookups():
+        name, module = modules[next(counter) % 2]
+        return {module.lookup(config) for _ in range(2000)} == {name}
+
+    assert all(run_concurrently(lookups, threads=8))
+    assert config._recursive_search.starting_path == config._recursive_search.root_path  # never changed
@@ -1,6 +1,13 @@
+import io
+import time
+from unittest import mock
+
 import pytest
 
-from prettyconf.loaders import EnvFile
+from prettyconf.loaders import EnvFile, Origin
+from prettyconf.parsers import BufferedStreamReader, EnvFileParser, MappedFileReader, is_ascii_compatible
+
+from .factory import run_concurrently
 
 
 def test_basic_config_object(envfile):
@@ -64,3 +71,300 @@ def test_fail_missing_envfile_get_item():
     config = EnvFile('does-not-exist.env')
     with pytest.raises(KeyError):
         return config['error']
+
+
+ENVFILE_SAMPLES = [
+    'KEY=value\n',
+    'KEY=value',
+    '  KEY = value  # comment\n',
+    "KEY='quoted # value'  # comment\n",
+    'KEY="it\'s" here\n',
+    "KEY='' value\n",
+    '=value\n==value\n',
+    'KEY\nOTHER=value\n',
+    "# it's a comment\nKEY=value\n",
+    "KEY=value # it's a comment\nOTHER=value # comment\n",
+    'KEY="unbalanced\nOTHER=value # comment\n',
+    'KEY=multiple \\\nlines\n',
+    'KEY=literal \\ backslash\n',
+    '\tKEY=value\r\n',
+]
+
+
+@pytest.mark.parametrize('content', ENVFILE_SAMPLES)
+def test_line_parser_matches_state_machine(content):
+    parsed = list(EnvFileParser(io.StringIO(content)).parse_config())
+
+    with mock.patch('prettyconf.parsers._parse_simple_line', return_value=NotImplemented):
+        expected = list(EnvFileParser(io.StringIO(content)).parse_config())
+
+    assert parsed == expected
+
+
+def test_line_parser_matches_state_machine_for_envfile(envfile):
+    with open(envfile) as stream:
+        parsed = list(EnvFileParser(stream).parse_config())
+
+    with open(envfile) as stream, mock.patch('prettyconf.parsers._parse_simple_line', return_value=NotImplemented):
+        expected = list(EnvFileParser(stream).parse_config())
+
+    assert parsed == expected
+
+
+@mock.patch.object(BufferedStreamReader, 'BUFFER_SIZE', 3)
+def test_read_lines_across_buffers():
+    stream = BufferedStreamReader(io.StringIO('FIRST=1\nSECOND=22\n\nLAST=333'))
+
+    lines = iter(stream.read_line, '')
+    assert list(lines) == ['FIRST=1\n', 'SECOND=22\n', '\n', 'LAST=333']
+
+
+def _feed(content, size):
+    parser = EnvFileParser()
+    configs = []
+    for start in range(0, len(content), size):
+        configs += parser.feed(content[start : start + size])
+    return configs + parser.close()
+
+
+@pytest.mark.parametrize('size', [1, 2, 3, 7, 1024])
+@pytest.mark.parametrize('content', [*ENVFILE_SAMPLES, 'KEY=one\rOTHER=two\r', 'KEY=multiple \\\r\nlines\r\n', ''])
+def test_feed_matches_text_stream(tmp_path, content, size):
+    filename = tmp_path / '.env'
+    filename.write_bytes(content.encode('utf-8'))
+
+    with open(filename, encoding='utf-8') as envfile:
+        expected = list(EnvFileParser(envfile).parse_config())
+
+    assert _feed(content, size) == expected
+    assert _feed(content.encode('utf-8'), size) == expected
+
+
+def test_feed_returns_configurations_as_soon_as_completed():
+    parser = EnvFileParser()
+
+    assert parser.feed('FIRST=1\nSEC') == [('FIRST', '1')]
+    assert parser.feed('OND=2') == []
+    assert parser.feed('\nTHIRD="multiple\\\n') == [('SECOND', '2')]
+    assert parser.feed('lines"\nLAST=4') == [('THIRD', 'multiplelines')]
+    assert parser.config_line == 3
+    assert parser.close() == [('LAST', '4')]
+    assert parser.config_line == 5
+
+
+def test_feed_decodes_bytes_split_in_multibyte_characters():
+    content = 'KEY=Valor não ASCII\n'.encode('utf-16')
+    parser = EnvFileParser(encoding='utf-16')
+
+    configs = []
+    for byte in content:
+        configs += parser.feed(bytes([byte]))
+
+    assert configs + parser.close() == [('KEY', 'Valor não ASCII')]
+
+
+def _parse_mapped(filename, encoding='utf-8', mapped=True):
+    with open(filename, 'rb') as envfile, MappedFileReader(envfile, encoding, mapped) as reader:
+        return list(EnvFileParser(reader).parse_config())
+
+
+@pytest.mark.parametrize('non_ascii', ['', 'NÃO=ASCII ç\n'])  # not parsed as text
+@pytest.mark.parametrize('content', [*ENVFILE_SAMPLES, 'KEY=one\rOTHER=two\r', 'KEY=multiple \\\r\nlines\r\n', ''])
+@pytest.mark.parametrize('mapped', [True, False])
+def test_mapped_reader_matches_text_stream(tmp_path, content, non_ascii, mapped):
+    content = non_ascii + content
+    filename = tmp_path / '.env'
+    filename.write_bytes(content.encode('utf-8'))
+
+    with open(filename, encoding='utf-8') as envfile:
+        expected = list(EnvFileParser(envfile).parse_config())
+
+    assert _parse_mapped(filename, mapped=mapped) == expected
+
+
+@pytest.mark.parametrize(('reload_interval', 'mapped'), [(None, True), (60, False)])
+def test_reloaded_envfile_is_not_memory_mapped(tmp_path, reload_interval, mapped):
+    filename = tmp_path / '.env'
+    filename.write_text('KEY=value\n')
+
+    with mock.patch('prettyconf.loaders.MappedFileReader', wraps=MappedFileReader) as reader:
+        assert EnvFile(str(filename), reload_interval=reload_interval, encoding='utf-8')['KEY'] == 'value'
+
+    reader.assert_called_once_with(mock.ANY, 'utf-8', mapped)
+
+
+@pytest.mark.parametrize('window_size', [1, 8, 20])
+def test_mapped_reader_decodes_ascii_lines_across_windows(tmp_path, window_size):
+    content = ''.join([*ENVFILE_SAMPLES, 'KEY=one\rOTHER=two\r', 'KEY=multiple \\\r\nlines\r\n', 'LAST=value'])
+    filename = tmp_path / '.env'
+    filename.write_bytes(content.encode('ascii'))
+
+    with open(filename, encoding='ascii') as envfile:
+        expected = list(EnvFileParser(envfile).parse_config())
+
+    with mock.patch('prettyconf.parsers.ASCII_WINDOW_SIZE', window_size):
+        assert _parse_mapped(filename) == expected
+
+
+def test_mapped_reader_decodes_keys_and_values(tmp_path):
+    filename = tmp_path / '.env'
+    filename.write_bytes('CHAVE=não\n# comentário\nOUTRA="ação"\n'.encode('latin-1'))
+
+    assert _parse_mapped(filename, 'latin-1') == [('CHAVE', 'não'), ('OUTRA', 'ação')]
+
+
+@pytest.mark.parametrize(
+    'encoding,expected',
+    [('utf8', True), ('ascii', True), ('latin1', True), ('cp1252', True), ('utf-16', False), ('shift_jis', False)],
+)
+def test_is_ascii_compatible(encoding, expected):
+    assert is_ascii_compatible(encoding) is expected
+
+
+@pytest.mark.parametrize('encoding', ['latin-1', 'utf-16'])
+def test_envfile_encoding(tmp_path, encoding):
+    filename = tmp_path / '.env'
+    filename.write_bytes('KEY=não\n'.encode(encoding))
+
+    with mock.patch('locale.getpreferredencoding', return_value='utf-8') as preferred_encoding:
+        assert EnvFile(str(filename), encoding=encoding)['KEY'] == 'não'
+
+    preferred_encoding.assert_not_called()
+
+
+def test_envfile_not_ascii_compatible_encoding(tmp_path):
+    filename = tmp_path / '.env'
+    filename.write_bytes('KEY=Value\n'.encode('utf-16'))
+
+    with mock.patch('locale.getpreferredencoding', return_value='utf-16'):
+        assert EnvFile(str(filename))['KEY'] == 'Value'
+
+
+def test_reload_changed_envfile(tmp_path):
+    filename = tmp_path / '.env'
+    filename.write_text('KEY=Value\n')
+    config = EnvFile(str(filename), reload_interval=0)
+    reloaded = mock.Mock()
+    config.add_reload_listener(reloaded)
+
+    assert config['KEY'] == 'Value'
+    assert config['KEY'] == 'Value'
+    reloaded.assert_not_called()
+
+    filename.write_text('KEY=New value\n')
+    assert config['KEY'] == 'New value'
+    reloaded.assert_called_once_with(config)
+
+
+def test_reload_checks_file_once_per_interval(tmp_path):
+    filename = tmp_path / '.env'
+    filename.write_text('KEY=Value\n')
+    config = EnvFile(str(filename), reload_interval=3600)
+
+    assert config['KEY'] == 'Value'
+    filename.write_text('KEY=New value\n')
+    with mock.patch.object(config, '_stat_file') as stat_file:
+        assert config['KEY'] == 'Value'
+
+    stat_file.assert_not_called()
+
+
+def test_reload_removed_envfile(tmp_path):
+    filename = tmp_path / '.env'
+    filename.write_text('KEY=Value\n')
+    config = EnvFile(str(filename), reload_interval=0)
+    reloaded = mock.Mock()
+    config.add_reload_listener(reloaded)
+    assert config['KEY'] == 'Value'
+
+    filename.unlink()
+    for _ in range(3):
+        assert 'KEY' not in config
+    reloaded.assert_called_once_with(config)
+
+    filename.write_text('KEY=New value\n')
+    assert config['KEY'] == 'New value'
+    assert reloaded.call_count == 2
+
+
+def test_envfile_is_not_reloaded_by_default(tmp_path):
+    filename = tmp_path / '.env'
+    filename.write_text('KEY=Value\n')
+    config = EnvFile(str(filename))
+    assert config['KEY'] == 'Value'
+
+    filename.write_text('KEY=New value\n')
+    assert config['KEY'] == 'Value'
+
+
+LINES_CONTENT = '# comment\nFIRST=1\n\nSECOND="multi\nline"\nTHIRD=multiple \\\nlines\nLAST=4'
+
+
+def _config_lines(parser):
+    return [(key, parser.config_line) for key, _ in parser.parse_config()]
+
+
+def test_parser_config_lines(tmp_path):
+    expected = [('FIRST', 2), ('SECOND', 4), ('THIRD', 6), ('LAST', 8)]
+    assert _config_lines(EnvFileParser(io.StringIO(LINES_CONTENT))) == expected
+
+    with mock.patch('prettyconf.parsers._parse_simple_line', return_value=NotImplemented):
+        assert _config_lines(EnvFileParser(io.StringIO(LINES_CONTENT))) == expected
+
+    filename = tmp_path / '.env'
+    filename.write_bytes(LINES_CONTENT.replace('\n', '\r\n').encode('utf-8'))
+    with open(filename, 'rb') as envfile, MappedFileReader(envfile, 'utf-8') as reader:
+        assert _config_lines(EnvFileParser(reader)) == expected
+
+
+def test_explain(tmp_path):
+    filename = tmp_path / '.env'
+    filename.write_text(LINES_CONTENT)
+    config = EnvFile(str(filename))
+
+    assert config.explain('third') == [Origin(config, f'{filename}:6', 'multiple lines')]
+    assert config.explain('missing') == []
+    assert config.provenance()['LAST'] == [Origin(config, f'{filename}:8', '4')]
+    assert list(config.provenance()) == ['FIRST', 'SECOND', 'THIRD', 'LAST']
+
+
+def test_explain_missing_envfile():
+    config = EnvFile('does-not-exist')
+
+    assert config.explain('KEY') == []
+    assert config.provenance() == {}
+
+
+def test_envfile_is_parsed_once_by_concurrent_lookups(tmp_path):
+    filename = tmp_path / '.env'
+    filename.write_text('FIRST=1\nSECOND=2\n')
+    config = EnvFile(str(filename))
+    read_configs = EnvFile._read_configs
+
+    def slow_read_configs(parser):
+        time.sleep(0.05)  # let the other threads find the file not parsed yet
+        return read_configs(parser)
+
+    with mock.patch.object(EnvFile, '_read_configs', side_effect=slow_read_configs) as parse:
+        results = run_concurrently(lambda: (config['FIRST'], config['SECOND']))
+
+    assert results == [('1', '2')] * len(results)
+    assert parse.call_count == 1
+
+    config._load_lock = None  # parsed configurations are read without locking
+    assert config['SECOND'] == '2'
+
+
+def test_envfile_reload_is_parsed_once(tmp_path):
+    filename = tmp_path / '.env'
+    filename.write_text('KEY=Value\n')
+    config = EnvFile(str(filename), reload_interval=0)
+    assert config['KEY'] == 'Value'
+
+    filename.write_text('KEY=New value\n')
+    with mock.patch.object(EnvFile, '_read_configs', wraps=EnvFile._read_configs) as parse:
+        results = run_concurrently(lambda: config['KEY'])
+
+    assert set(results) <= {'Value', 'New value'}
+    assert config['KEY'] == 'New value'
+    assert parse.call_count == 1
@@ -1,8 +1,9 @@
 import os
+from unittest import mock
 
 import pytest
 
-from prettyconf.loaders import Environment
+from prettyconf.loaders import Environment, Origin
 
 
 def test_basic_config():
@@ -45,3 +46,43 @@ def test_custom_var_format():
     assert 'test' == config['TEST']
 
     del os.environ['_TEST']
+
+
+def test_explain(monkeypatch):
+    monkeypatch.setenv('PRETTYCONF_TEST', 'value')
+    config = Environment()
+
+    assert config.explain('prettyconf_test') == [Origin(config, 'environment variable PRETTYCONF_TEST', 'value')]
+    assert config.explain('PRETTYCONF_UNKNOWN') == []
+    assert config.provenance()['PRETTYCONF_TEST'] == config.explain('PRETTYCONF_TEST')
+
+
+def test_snapshot(monkeypatch):
+    monkeypatch.setenv('PRETTYCONF_TEST', 'value')
+    config = Environment(snapshot=True)
+    monkeypatch.setenv('PRETTYCONF_TEST', 'changed')
+    monkeypatch.setenv('PRETTYCONF_NEW', 'new')
+
+    assert config['prettyconf_test'] == 'value'
+    assert config['prettyconf_test'] == 'value'
+    assert 'prettyconf_new' not in config
+    with pytest.raises(KeyError):
+        _ = config['prettyconf_new']
+    assert config.explain('prettyconf_test') == [Origin(config, 'environment variable PRETTYCONF_TEST', 'value')]
+
+    config.refresh()
+    assert config['prettyconf_test'] == 'changed'
+    assert config['prettyconf_new'] == 'new'
+    assert config.provenance()['PRETTYCONF_NEW'] == config.explain('prettyconf_new')
+
+
+def test_refresh_notifies_reload(monkeypatch):
+    reloaded = mock.Mock()
+    config = Environment()
+    config.add_reload_listener(reloaded)
+    monkeypatch.setenv('PRETTYCONF_TEST', 'value')
+
+    config.refresh()
+
+    reloaded.assert_called_once_with(config)
+    assert config['PRETTYCONF_TEST'] == 'value'
@@ -1,10 +1,16 @@
+import glob
 import os
+import time
+from unittest import mock
 
 import pytest
 
+from prettyconf.configuration import Configuration
 from prettyconf.exceptions import InvalidPath
 from prettyconf.loaders import RecursiveSearch
 
+from .factory import run_concurrently
+
 
 def test_config_file_parsing(create_file, files_path):
     create_file(files_path + '/../.env')
@@ -105,3 +111,213 @@ def test_env_dir_wont_break_loader(files_path):
         os.removedirs(env_directory)
 
     assert 'FOO' not in discovery
+
+
+def test_starting_path_resolution_is_memoized(files_path):
+    discovery = RecursiveSearch(files_path)
+
+    with mock.patch('os.path.realpath') as realpath:
+        discovery.starting_path = files_path
+
+    realpath.assert_not_called()
+    assert discovery.starting_path == os.path.realpath(files_path)
+
+
+def test_relative_starting_path_resolution_is_not_memoized(files_path):
+    discovery = RecursiveSearch()
+    discovery.starting_path = 'tests'
+    assert 'tests' not in discovery._resolved_paths
+
+
+def test_memoized_starting_path_keeps_root_path_validation():
+    discovery = RecursiveSearch(root_path='/foo')
+
+    with pytest.raises(InvalidPath):
+        discovery.starting_path = '/bar'
+    with pytest.raises(InvalidPath):
+        discovery.starting_path = '/bar'
+
+
+def test_changing_starting_path_discovers_new_config_files(create_dir):
+    root_dir, first_path = create_dir('first')
+    _, second_path = create_dir('second')
+    with open(os.path.join(first_path, '.env'), 'a') as file_:
+        file_.write('FOO=first')
+    with open(os.path.join(second_path, '.env'), 'a') as file_:
+        file_.write('FOO=second')
+
+    discovery = RecursiveSearch(first_path, root_path=root_dir)
+    assert discovery['FOO'] == 'first'
+
+    discovery.starting_path = second_path
+    assert discovery['FOO'] == 'second'
+
+    discovery.starting_path = first_path
+    assert discovery['FOO'] == 'first'
+
+
+def test_parent_directories_are_scanned_once(create_dir):
+    root_dir, first_path = create_dir('parent/first')
+    _, second_path = create_dir('parent/second')
+    with open(os.path.join(root_dir, 'parent', '.env'), 'a') as file_:
+        file_.write('FOO=parent')
+
+    discovery = RecursiveSearch(first_path, root_path=root_dir)
+    with mock.patch.object(discovery, '_scan_path', wraps=discovery._scan_path) as scan_path:
+        assert discovery['FOO'] == 'parent'
+        discovery.starting_path = second_path
+        assert discovery['FOO'] == 'parent'
+        discovery.starting_path = first_path
+        assert discovery['FOO'] == 'parent'
+
+    scanned_paths = [call.args[0] for call in scan_path.call_args_list]
+    assert sorted(scanned_paths) == sorted(
+        [
+            os.path.realpath(first_path),
+            os.path.realpath(second_path),
+            os.path.realpath(os.path.join(root_dir, 'parent')),
+            os.path.realpath(root_dir),
+        ]
+    )
+
+
+def test_reload_discovered_config_files(create_dir):
+    root_dir, start_path = create_dir('start')
+    filename = os.path.join(start_path, '.env')
+    with open(filename, 'w') as file_:
+        file_.write('FOO=bar')
+
+    discovery = RecursiveSearch(start_path, root_path=root_dir, reload_interval=0)
+    reloaded = mock.Mock()
+    discovery.add_reload_listener(reloaded)
+    assert discovery['FOO'] == 'bar'
+
+    with open(filename, 'w') as file_:
+        file_.write('FOO=new bar')
+
+    assert discovery['FOO'] == 'new bar'
+    reloaded.assert_called_once_with(discovery)
+
+
+@pytest.mark.parametrize(
+    'patterns',
+    ['.env', ('*.ini', '*.cfg'), '*', '.*', '*env*', '[sx]*.ini', ('nested/*.ini', 'missing.cfg')],
+)
+def test_get_filenames_matches_glob(create_dir, patterns):
+    _, path = create_dir('project/nested')
+    path = os.path.dirname(path)
+    for name in ('.env', 'settings.ini', 'setup.cfg', '.hidden.ini', 'x.ini', 'env.txt', 'nested/other.ini'):
+        with open(os.path.join(path, name), 'w'):
+            pass
+
+    expected = []
+    for pattern in (patterns,) if isinstance(patterns, str) else patterns:
+        expected += glob.glob(os.path.join(path, pattern))
+
+    assert RecursiveSearch.get_filenames(path, patterns) == expected
+
+
+def test_directories_are_listed_once(create_dir):
+    root_dir, path = create_dir('first/second/third')
+    with open(os.path.join(root_dir, 'settings.ini'), 'w') as file_:
+        file_.write('[settings]\nFOO=bar\n')
+
+    discovery = RecursiveSearch(path, root_path=root_dir)
+    with mock.patch('os.scandir', wraps=os.scandir) as scandir:
+        assert discovery['FOO'] == 'bar'
+
+    assert scandir.call_count == 4  # third, second, first and root_dir
+
+
+def test_lookups_are_indexed(create_dir):
+    root_dir, start_path = create_dir('start')
+    with open(os.path.join(start_path, '.env'), 'w') as file_:
+        file_.write('FOO=start')
+    with open(os.path.join(root_dir, 'settings.ini'), 'w') as file_:
+        file_.write('[settings]\nfoo=root\nbar=root\n')
+
+    discovery = RecursiveSearch(start_path, root_path=root_dir)
+    discovery.config_files  # noqa: B018
+    with mock.patch.object(discovery, '_lookup', wraps=discovery._lookup) as lookup:
+        for _ in range(3):
+            assert discovery['FOO'] == 'start'
+            assert discovery['bar'] == 'root'
+            assert 'missing' not in discovery
+            with pytest.raises(KeyError):
+                discovery['missing']
+
+    assert lookup.call_count == 3
+
+    discovery.starting_path = root_dir
+    assert discovery['FOO'] == 'root'
+
+
+def test_index_is_rebuilt_on_reload(create_dir):
+    root_dir, start_path = create_dir('start')
+    filename = os.path.join(start_path, '.env')
+    with open(filename, 'w') as file_:
+        file_.write('FOO=bar')
+
+    discovery = RecursiveSearch(start_path, root_path=root_dir, reload_interval=60)
+    assert discovery['FOO'] == 'bar'
+    with open(filename, 'w') as file_:
+        file_.write('FOO=new bar\nNEW=value')
+
+    assert 'NEW' not in discovery  # next check in 60 seconds
+    with mock.patch('time.monotonic', return_value=time.monotonic() + 60):
+        assert discovery['NEW'] == 'value'
+        assert discovery['FOO'] == 'new bar'
+
+
+def test_reload_checks_each_starting_path(create_dir):
+    root_dir, first_path = create_dir('first')
+    second_path = os.path.join(root_dir, 'second')
+    os.mkdir(second_path)
+    for path in (first_path, second_path):
+        with open(os.path.join(path, '.env'), 'w') as file_:
+            file_.write('FOO=bar')
+
+    discovery = RecursiveSearch(root_path=root_dir, reload_interval=60)
+    assert discovery.lookup('FOO', first_path) == 'bar'
+    assert discovery.lookup('FOO', second_path) == 'bar'
+    with open(os.path.join(second_path, '.env'), 'w') as file_:
+        file_.write('FOO=new bar')
+
+    with mock.patch('time.monotonic', return_value=time.monotonic() + 60):
+        assert discovery.lookup('FOO', first_path) == 'bar'  # doesn't check the files found from second_path
+        assert discovery.lookup('FOO', second_path) == 'new bar'
+
+
+def test_config_files_encoding(create_dir):
+    root_dir, start_path = create_dir('start')
+    with open(os.path.join(start_path, '.env'), 'w', encoding='latin-1') as file_:
+        file_.write('CHAVE=não\n')
+    with open(os.path.join(root_dir, 'settings.ini'), 'w', encoding='latin-1') as file_:
+        file_.write('[settings]\nopcao=ação\n')
+
+    discovery = RecursiveSearch(start_path, root_path=root_dir, encoding='latin-1')
+    assert [config_file.encoding for config_file in discovery.config_files] == ['latin-1', 'latin-1']
+    assert discovery['CHAVE'] == 'não'
+    assert discovery['opcao'] == 'ação'
+    assert Configuration(encoding='latin-1')._recursive_search.encoding == 'latin-1'
+
+
+def test_config_files_are_discovered_once_by_concurrent_lookups(create_dir):
+    root_dir, start_path = create_dir('first/second')
+    with open(os.path.join(start_path, '.env'), 'w') as file_:
+        file_.write('FOO=start')
+    with open(os.path.join(root_dir, 'settings.ini'), 'w') as file_:
+        file_.write('[settings]\nbar=root\n')
+
+    discovery = RecursiveSearch(start_path, root_path=root_dir)
+    scan_path = discovery._scan_path
+
+    def slow_scan_path(path):
+        time.sleep(0.01)  # let the other threads find the files not discovered yet
+        return scan_path(path)
+
+    with mock.patch.object(discovery, '_scan_path', side_effect=slow_scan_path) as scan:
+        results = run_concurrently(lambda: (discovery['FOO'], discovery['bar']))
+
+    assert results == [('start', 'root')] * len(results)
+    assert scan.call_count == 3  # second, first and root_dir
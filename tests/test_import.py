@@ -0,0 +1,30 @@
+import subprocess
+import sys
+
+# generous budget (in microseconds) to keep heavy imports (eg. boto3) out of ``import prettyconf``
+IMPORT_TIME_BUDGET = 150_000
+
+
+def _import_prettyconf(code=''):
+    return subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import prettyconf, sys; {code}'],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def test_optional_dependencies_are_not_imported():
+    result = _import_prettyconf("print(sorted(set(sys.modules) & {'boto3', 'botocore', 'concurrent.futures'}))")
+
+    assert result.stdout.strip() == '[]'
+
+
+def test_import_time_budget():
+    result = _import_prettyconf()
+    cumulative = [
+        int(line.split('|')[1]) for line in result.stderr.splitlines() if line.split('|')[-1].strip() == 'prettyconf'
+    ]
+
+    assert cumulative
+    assert cumulative[0] < IMPORT_TIME_BUDGET
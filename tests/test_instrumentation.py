@@ -0,0 +1,196 @@
+import os
+import signal
+from unittest import mock
+
+import pytest
+
+from prettyconf.configuration import Configuration
+from prettyconf.exceptions import UnknownConfiguration
+from prettyconf.instrumentation import Histogram, LookupStatistics, Observer
+from prettyconf.loaders import CommandLine, EnvFile, IniFile, RecursiveSearch
+
+
+def config_factory(**configs):
+    return CommandLine(parser=None, get_args=lambda parser: configs)
+
+
+def test_observer_hooks():
+    first, second = config_factory(KEY='1'), config_factory(KEY='2', OTHER='3')
+    observer = mock.Mock(spec=Observer)
+    config = Configuration(loaders=[first, second])
+    config.add_observer(observer)
+
+    assert config('OTHER', cast=int) == 3
+
+    observer.on_miss.assert_called_once_with(first, 'OTHER', mock.ANY)
+    observer.on_hit.assert_called_once_with(second, 'OTHER', mock.ANY)
+    observer.on_lookup.assert_called_once_with('OTHER', mock.ANY)
+    observer.on_cast_error.assert_not_called()
+
+
+def test_observer_cast_errors():
+    observer = mock.Mock(spec=Observer)
+    config = Configuration(loaders=[config_factory(KEY='value')])
+    config.add_observer(observer)
+
+    with pytest.raises(ValueError) as exc_info:
+        config('KEY', cast=int)
+
+    observer.on_cast_error.assert_called_once_with('KEY', 'value', exc_info.value)
+    observer.on_lookup.assert_called_once_with('KEY', mock.ANY)
+
+
+def test_observer_unknown_configuration():
+    observer = mock.Mock(spec=Observer)
+    config = Configuration(loaders=[config_factory()])
+    config.add_observer(observer)
+
+    with pytest.raises(UnknownConfiguration):
+        config('KEY')
+    assert config('KEY', default='default') == 'default'
+
+    assert observer.on_miss.call_count == 2
+    assert observer.on_lookup.call_count == 2
+
+
+def test_observer_cached_lookups():
+    loader = config_factory(KEY='1')
+    observer = mock.Mock(spec=Observer)
+    config = Configuration(loaders=[loader], cache=True)
+    config.add_observer(observer)
+
+    config('KEY')
+    config('KEY')
+
+    observer.on_hit.assert_called_once_with(loader, 'KEY', mock.ANY)
+    assert observer.on_lookup.call_count == 2
+
+
+def test_observer_many():
+    first, second = config_factory(KEY='1'), config_factory(OTHER='2')
+    observer = mock.Mock(spec=Observer)
+    config = Configuration(loaders=[first, second])
+    config.add_observer(observer)
+
+    config.many({'KEY': int, 'OTHER': int})
+
+    assert observer.on_hit.call_args_list == [mock.call(first, 'KEY', mock.ANY), mock.call(second, 'OTHER', mock.ANY)]
+    observer.on_miss.assert_called_once_with(first, 'OTHER', mock.ANY)
+
+
+def test_remove_observer():
+    loader = config_factory(KEY='1')
+    observer = mock.Mock(spec=Observer)
+    config = Configuration(loaders=[loader])
+    config.add_observer(observer)
+    config.remove_observer(observer)
+
+    config('KEY')
+
+    observer.on_lookup.assert_not_called()
+    assert loader._observers == ()
+
+
+def test_observer_loads(env_config, ini_config):
+    observer = mock.Mock(spec=Observer)
+    envfile, inifile = EnvFile(env_config), IniFile(ini_config)
+    config = Configuration(loaders=[envfile])
+    config.add_observer(observer)
+    config.loaders = [envfile, inifile]
+
+    config('INIFILE')
+    config('INIFILE')
+
+    assert observer.on_load.call_args_list == [mock.call(envfile, mock.ANY), mock.call(inifile, mock.ANY)]
+
+
+def test_observer_recursive_search_loads(env_config, ini_config):
+    observer = mock.Mock(spec=Observer)
+    discovery = RecursiveSearch(starting_path=os.path.dirname(env_config))
+    discovery.add_observer(observer)
+
+    assert discovery['ENVFILE'] == 'Environment File Value'
+
+    loaded = {loader.filename for (loader, _), _ in observer.on_load.call_args_list}
+    assert {os.path.realpath(env_config), os.path.realpath(ini_config)} <= loaded
+
+    discovery.remove_observer(observer)
+    assert all(loader._observers == () for loader in discovery._config_file_loaders())
+
+
+def test_histogram():
+    histogram = Histogram(buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value)
+
+    assert histogram.to_dict() == {'buckets': {0.1: 2, 1.0: 3, float('inf'): 4}, 'sum': 2.65, 'count': 4}
+
+
+def test_lookup_statistics():
+    loader = config_factory(KEY='value')
+    statistics = LookupStatistics()
+    config = Configuration(loaders=[loader])
+    config.add_observer(statistics)
+
+    config('KEY')
+    config('KEY')
+    config('UNKNOWN', default=None)
+    with pytest.raises(ValueError):
+        config('KEY', cast=int)
+    statistics.on_load(loader, 0.5)
+
+    result = statistics.to_dict()
+    assert result['reads'] == {'KEY': 3, 'UNKNOWN': 1}
+    assert result['cast_errors'] == {'KEY': 1}
+    assert result['lookup_duration']['count'] == 4
+    loader_statistics = result['loaders'][repr(loader)]
+    assert (loader_statistics['hits'], loader_statistics['misses'], loader_statistics['loads']) == (3, 1, 1)
+    assert loader_statistics['lookup_duration']['count'] == 4
+    assert loader_statistics['load_duration']['sum'] == 0.5
+
+    statistics.reset()
+    assert statistics.to_dict()['reads'] == {}
+
+
+def test_lookup_statistics_prometheus():
+    loader = config_factory(KEY='value')
+    statistics = LookupStatistics(buckets=(0.5,))
+    config = Configuration(loaders=[loader])
+    config.add_observer(statistics)
+
+    config('KEY')
+    statistics.on_load(loader, 1.0)
+    statistics.on_load(loader, 0.25)
+
+    text = statistics.to_prometheus(prefix='app')
+    label = repr(loader).replace('"', '\\"')
+    assert '# TYPE app_reads_total counter\napp_reads_total{key="KEY"} 1\n' in text
+    assert '# TYPE app_lookup_duration_seconds histogram\n' in text
+    assert 'app_lookup_duration_seconds_bucket{le="+Inf"} 1\napp_lookup_duration_seconds_sum ' in text
+    assert f'app_loader_hits_total{{loader="{label}"}} 1\n' in text
+    assert f'app_loader_load_duration_seconds_bucket{{loader="{label}",le="0.5"}} 1\n' in text
+    assert f'app_loader_load_duration_seconds_bucket{{loader="{label}",le="+Inf"}} 2\n' in text
+    assert f'app_loader_load_duration_seconds_sum{{loader="{label}"}} 1.25\n' in text
+    assert text.endswith('\n')
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='requires fork()')
+def test_statistics_lock_is_reset_after_fork():
+    statistics = LookupStatistics()
+    config = Configuration(loaders=[config_factory(KEY='1')])
+    config.add_observer(statistics)
+    statistics._lock.acquire()  # as if held by a loader refresh thread while forking
+
+    pid = os.fork()
+    if pid == 0:  # child
+        status = 1
+        try:
+            signal.alarm(5)  # killed if the lookup waits for the parent's lock
+            if config('KEY') == '1' and statistics.reads['KEY'] == 1:
+                status = 0
+        finally:
+            os._exit(status)
+
+    statistics._lock.release()
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
@@ -1,11 +1,20 @@
 import importlib
+import os
+import signal
 import sys
+import threading
+import time
 from unittest import mock
 
+import boto3
 import pytest
 from botocore.exceptions import BotoCoreError
+from botocore.stub import Stubber
 
-from prettyconf.loaders import AwsParameterStore
+from prettyconf.configuration import Configuration
+from prettyconf.loaders import AwsParameterStore, Origin
+
+from .factory import run_concurrently
 
 PARAMETER_RESPONSE = {
     'Parameters': [
@@ -103,3 +112,253 @@ def test_parameter_store_access_fail(mock_boto):
     assert 'DATABASE_URL' not in config
     with pytest.raises(KeyError):
         assert config['DATABASE_URL']
+
+
+def _parameters_by_path(responses):
+    def get_parameters_by_path(Path, **kwargs):
+        return {'Parameters': [{'Name': name, 'Type': 'String', 'Value': value} for name, value in responses[Path]]}
+
+    return get_parameters_by_path
+
+
+@mock.patch('prettyconf.loaders.boto3')
+def test_multiple_paths_precedence(mock_boto):
+    mock_boto.client.return_value.get_parameters_by_path.side_effect = _parameters_by_path(
+        {
+            '/api': [('/api/HOST', 'api_host')],
+            '/common': [('/common/HOST', 'common_host'), ('/common/DEBUG', 'false')],
+            '/other': [('/other/DEBUG', 'true'), ('/other/PORT', '8000')],
+        }
+    )
+    config = AwsParameterStore(path=['/api', '/common', '/other'])
+
+    assert config['HOST'] == 'api_host'
+    assert config['DEBUG'] == 'false'
+    assert config['PORT'] == '8000'
+    assert mock_boto.client.call_count == 1
+    calls = mock_boto.client.return_value.get_parameters_by_path.call_args_list
+    assert sorted(call.kwargs['Path'] for call in calls) == ['/api', '/common', '/other']
+
+
+@mock.patch('prettyconf.loaders.boto3')
+def test_recursive_fetch_precedence(mock_boto):
+    mock_boto.client.return_value.get_parameters_by_path.side_effect = _parameters_by_path(
+        {
+            '/api': [
+                ('/api/db/replica/HOST', 'replica_host'),
+                ('/api/db/PORT', '5432'),
+                ('/api/cache/PORT', '11211'),
+                ('/api/HOST', 'api_host'),
+            ],
+        }
+    )
+    config = AwsParameterStore(path='/api', recursive=True)
+
+    assert config['HOST'] == 'api_host'
+    assert config['PORT'] == '11211'
+    mock_boto.client.return_value.get_parameters_by_path.assert_called_with(Path='/api', Recursive=True)
+
+
+@mock.patch('prettyconf.loaders.boto3')
+def test_multiple_paths_fetch_failure(mock_boto):
+    mock_boto.client.return_value.get_parameters_by_path.side_effect = BotoCoreError
+    config = AwsParameterStore(path=['/api', '/common'])
+
+    assert 'HOST' not in config
+
+
+def test_recursive_fetch_with_stubbed_client():
+    client = boto3.client('ssm', region_name='us-east-1', aws_access_key_id='key', aws_secret_access_key='secret')
+    stubber = Stubber(client)
+    stubber.add_response(
+        'get_parameters_by_path',
+        PARAMETER_RESPONSE_FIRST_PAGE,
+        {'Path': '/api', 'Recursive': True},
+    )
+    stubber.add_response(
+        'get_parameters_by_path',
+        PARAMETER_RESPONSE_LAST_PAGE,
+        {'Path': '/api', 'Recursive': True, 'NextToken': 'token'},
+    )
+
+    with stubber, mock.patch('boto3.client', return_value=client):
+        config = AwsParameterStore(path='/api', recursive=True)
+        assert config['DEBUG'] == 'false'
+        assert config['HOST'] == 'host_url'
+
+    stubber.assert_no_pending_responses()
+
+
+def _wait_refresh(config):
+    thread = config._refresh_thread
+    if thread is not None:
+        thread.join(timeout=5)
+
+
+@mock.patch('prettyconf.loaders.boto3')
+def test_parameters_are_not_refreshed_without_ttl(mock_boto):
+    mock_boto.client.return_value.get_parameters_by_path.return_value = PARAMETER_RESPONSE
+    config = AwsParameterStore()
+
+    assert config['HOST'] == 'host_url'
+    assert config['HOST'] == 'host_url'
+    assert config._refresh_thread is None
+    assert mock_boto.client.return_value.get_parameters_by_path.call_count == 1
+
+
+@mock.patch('prettyconf.loaders.boto3')
+def test_expired_parameters_are_refreshed_in_background(mock_boto):
+    refreshing = threading.Event()
+    responses = [PARAMETER_RESPONSE]
+
+    def get_parameters_by_path(**kwargs):
+        if responses:
+            return responses.pop()
+        refreshing.wait(timeout=5)
+        return PARAMETER_RESPONSE_LAST_PAGE
+
+    mock_boto.client.return_value.get_parameters_by_path.side_effect = get_parameters_by_path
+    config = AwsParameterStore(ttl=0)
+    reloaded = mock.Mock()
+    config.add_reload_listener(reloaded)
+
+    assert config['HOST'] == 'host_url'  # first fetch, refresh starts
+    assert config['DEBUG'] == 'false'  # stale while refreshing
+    reloaded.assert_not_called()
+
+    refreshing.set()
+    _wait_refresh(config)
+
+    assert 'DEBUG' not in config
+    assert config['HOST'] == 'host_url'
+    _wait_refresh(config)
+    reloaded.assert_called_once_with(config)
+    assert mock_boto.client.call_count == 1
+
+
+@mock.patch('prettyconf.loaders.boto3')
+def test_refresh_keeps_stale_parameters_on_failure(mock_boto):
+    mock_boto.client.return_value.get_parameters_by_path.side_effect = [PARAMETER_RESPONSE, BotoCoreError()]
+    on_refresh = mock.Mock()
+    config = AwsParameterStore(ttl=0, on_refresh=on_refresh)
+
+    assert config['HOST'] == 'host_url'
+    _wait_refresh(config)
+
+    assert config._parameters['HOST'] == 'host_url'
+    assert on_refresh.call_count == 2
+    (_, duration, error), (_, _, refresh_error) = (call.args[:3] for call in on_refresh.call_args_list)
+    assert duration >= 0
+    assert error is None
+    assert isinstance(refresh_error, BotoCoreError)
+
+
+@mock.patch('prettyconf.loaders.boto3')
+def test_unexpired_parameters_are_not_refreshed(mock_boto):
+    mock_boto.client.return_value.get_parameters_by_path.return_value = PARAMETER_RESPONSE
+    config = AwsParameterStore(ttl=3600)
+
+    assert config['HOST'] == 'host_url'
+    assert config['HOST'] == 'host_url'
+    assert config._refresh_thread is None
+
+
+@mock.patch('prettyconf.loaders.boto3')
+def test_snapshot_restores_parameters(mock_boto, tmp_path):
+    mock_boto.client.return_value.get_parameters_by_path.return_value = PARAMETER_RESPONSE
+    snapshot = str(tmp_path / 'config.snapshot')
+    Configuration(loaders=[AwsParameterStore(path='/api', ttl=3600)]).save_snapshot(snapshot)
+    mock_boto.client.return_value.get_parameters_by_path.reset_mock()
+
+    config = Configuration(loaders=[AwsParameterStore(path='/api', ttl=3600)])
+    assert config.load_snapshot(snapshot)
+    assert config('HOST') == 'host_url'
+    mock_boto.client.return_value.get_parameters_by_path.assert_not_called()
+
+    assert not Configuration(loaders=[AwsParameterStore(path='/other', ttl=3600)]).load_snapshot(snapshot)
+
+
+@mock.patch('prettyconf.loaders.boto3')
+def test_snapshot_rejects_expired_parameters(mock_boto, tmp_path):
+    mock_boto.client.return_value.get_parameters_by_path.return_value = PARAMETER_RESPONSE
+    snapshot = str(tmp_path / 'config.snapshot')
+    Configuration(loaders=[AwsParameterStore(path='/api', ttl=60)]).save_snapshot(snapshot)
+
+    with mock.patch('prettyconf.loaders.time.time', return_value=time.time() + 30):
+        loader = AwsParameterStore(path='/api', ttl=60)
+        assert Configuration(loaders=[loader]).load_snapshot(snapshot)
+        assert 25 < time.monotonic() - loader._fetched_at < 35  # refreshed as if it had fetched them
+
+    with mock.patch('prettyconf.loaders.time.time', return_value=time.time() + 61):
+        assert not Configuration(loaders=[AwsParameterStore(path='/api', ttl=60)]).load_snapshot(snapshot)
+
+
+@mock.patch('prettyconf.loaders.boto3')
+def test_snapshot_skips_parameters_without_ttl(mock_boto, tmp_path):
+    mock_boto.client.return_value.get_parameters_by_path.return_value = PARAMETER_RESPONSE
+    snapshot = str(tmp_path / 'config.snapshot')
+    Configuration(loaders=[AwsParameterStore(path='/api')]).save_snapshot(snapshot)
+    mock_boto.client.return_value.get_parameters_by_path.reset_mock()
+
+    config = Configuration(loaders=[AwsParameterStore(path='/api')])
+    assert config.load_snapshot(snapshot)
+    assert config('HOST') == 'host_url'
+    mock_boto.client.return_value.get_parameters_by_path.assert_called()
+
+
+@mock.patch('prettyconf.loaders.boto3')
+def test_explain(mock_boto):
+    mock_boto.client.return_value.get_parameters_by_path.side_effect = _parameters_by_path(
+        {'/api': [('/api/DEBUG', 'false')], '/common': [('/common/DEBUG', 'true'), ('/common/HOST', 'host_url')]}
+    )
+    config = AwsParameterStore(path=['/api', '/common'])
+
+    assert config.explain('DEBUG') == [Origin(config, '/api/DEBUG', 'false')]
+    assert config.explain('UNKNOWN') == []
+    assert config.provenance() == {
+        'DEBUG': [Origin(config, '/api/DEBUG', 'false')],
+        'HOST': [Origin(config, '/common/HOST', 'host_url')],
+    }
+
+
+@mock.patch('prettyconf.loaders.boto3')
+def test_parameters_are_fetched_once_by_concurrent_lookups(mock_boto):
+    def get_parameters_by_path(**kwargs):
+        time.sleep(0.05)  # let the other threads find the parameters not fetched yet
+        return PARAMETER_RESPONSE
+
+    mock_boto.client.return_value.get_parameters_by_path.side_effect = get_parameters_by_path
+    config = AwsParameterStore()
+
+    results = run_concurrently(lambda: (config['HOST'], config['DEBUG']))
+
+    assert results == [('host_url', 'false')] * len(results)
+    assert mock_boto.client.call_count == 1
+    assert mock_boto.client.return_value.get_parameters_by_path.call_count == 1
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='requires fork()')
+@mock.patch('prettyconf.loaders.boto3')
+def test_client_and_refresh_are_reset_after_fork(mock_boto):
+    mock_boto.client.return_value.get_parameters_by_path.return_value = PARAMETER_RESPONSE
+    config = AwsParameterStore(ttl=3600)
+    config.preload()
+    config._refresh_lock.acquire()  # as if refreshing while forking
+    config._refresh_thread = mock.Mock()
+
+    pid = os.fork()
+    if pid == 0:  # child
+        status = 1
+        try:
+            signal.alarm(5)
+            config._fetched_at -= 3600  # expired, refreshed in a new thread
+            if config._client is None and config['HOST'] == 'host_url':
+                _wait_refresh(config)
+                status = 0 if mock_boto.client.call_count == 2 else 2
+        finally:
+            os._exit(status)
+
+    config._refresh_lock.release()
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+    assert mock_boto.client.call_count == 1
@@ -0,0 +1,72 @@
+import pytest
+
+from prettyconf.casts import Boolean, List
+from prettyconf.configuration import Configuration
+from prettyconf.exceptions import InvalidConfiguration, InvalidSettings, UnknownConfiguration
+from prettyconf.loaders import CommandLine
+from prettyconf.settings import Field, Settings
+
+
+class AppSettings(Settings):
+    debug = Field(cast=Boolean(), default=False)
+    port = Field(cast=int, name='PORT')
+    hosts = Field(cast=List(), default='localhost')
+
+
+class ExtendedSettings(AppSettings):
+    name = Field(default='app')
+    debug = Field(cast=Boolean(), default=True)
+
+
+def config_factory(**configs):
+    return Configuration(loaders=[CommandLine(parser=None, get_args=lambda parser: configs)])
+
+
+def test_settings_resolve_fields():
+    settings = AppSettings(config_factory(debug='yes', PORT='8000'))
+
+    assert settings.debug is True
+    assert settings.port == 8000
+    assert settings.hosts == ['localhost']
+
+
+def test_settings_are_slotted_and_read_only():
+    settings = AppSettings(config_factory(PORT='8000'))
+
+    assert AppSettings.__slots__ == ('debug', 'port', 'hosts')
+    assert not hasattr(settings, '__dict__')
+    with pytest.raises(AttributeError):
+        settings.port = 8080
+    with pytest.raises(AttributeError):
+        del settings.port
+
+
+def test_settings_inheritance():
+    settings = ExtendedSettings(config_factory(PORT='8000'))
+
+    assert ExtendedSettings.__slots__ == ('name',)
+    assert settings.debug is True
+    assert settings.name == 'app'
+    assert settings.port == 8000
+
+
+def test_settings_report_all_errors():
+    with pytest.raises(InvalidSettings) as exc_info:
+        AppSettings(config_factory(debug='maybe'))
+
+    errors = exc_info.value.errors
+    assert list(errors) == ['debug', 'PORT']
+    assert isinstance(errors['debug'], InvalidConfiguration)
+    assert isinstance(errors['PORT'], UnknownConfiguration)
+    assert "debug: Error casting value 'maybe' to boolean" in str(exc_info.value)
+
+
+def test_settings_use_default_config(monkeypatch):
+    monkeypatch.setenv('PORT', '8000')
+
+    assert AppSettings().port == 8000
+
+
+def test_field_fail_invalid_cast_type():
+    with pytest.raises(TypeError):
+        Field(cast='not callable')
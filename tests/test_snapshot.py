@@ -0,0 +1,168 @@
+import os
+from configparser import InterpolationError
+from unittest import mock
+
+import pytest
+
+from prettyconf.configuration import Configuration
+from prettyconf.loaders import CommandLine, EnvFile, Environment, IniFile, RecursiveSearch
+from prettyconf.snapshot import MAGIC
+
+
+@pytest.fixture
+def project(create_dir):
+    root_dir, app_dir = create_dir('project/app')
+    project_dir = os.path.dirname(app_dir)
+    with open(os.path.join(app_dir, '.env'), 'w') as file_:
+        file_.write('ENVFILE=env value\n')
+    with open(os.path.join(project_dir, 'settings.ini'), 'w') as file_:
+        file_.write('[DEFAULT]\nbase=/srv\n[settings]\ninifile=%(base)s/ini value\n')
+    return root_dir, app_dir
+
+
+def _config(root_dir, app_dir):
+    return Configuration(loaders=[RecursiveSearch(app_dir, root_path=root_dir)])
+
+
+def test_save_and_load_snapshot(project, tmp_path):
+    root_dir, app_dir = project
+    snapshot = str(tmp_path / 'config.snapshot')
+    _config(root_dir, app_dir).save_snapshot(snapshot)
+
+    config = _config(root_dir, app_dir)
+    with mock.patch('prettyconf.loaders.RecursiveSearch._scan_path') as scan_path:
+        assert config.load_snapshot(snapshot)
+        assert config('ENVFILE') == 'env value'
+        assert config('inifile') == '/srv/ini value'
+
+    scan_path.assert_not_called()
+    with open(snapshot, 'rb') as snapshot_file:
+        assert snapshot_file.read().startswith(MAGIC)
+
+
+def test_snapshot_restores_file_loaders(project, tmp_path):
+    root_dir, app_dir = project
+    snapshot = str(tmp_path / 'config.snapshot')
+    envfile = os.path.join(app_dir, '.env')
+    inifile = os.path.join(os.path.dirname(app_dir), 'settings.ini')
+    Configuration(loaders=[Environment(), EnvFile(envfile), IniFile(inifile)]).save_snapshot(snapshot)
+
+    config = Configuration(loaders=[Environment(), EnvFile(envfile), IniFile(inifile)])
+    with mock.patch('prettyconf.loaders.EnvFileParser') as parser:
+        assert config.load_snapshot(snapshot)
+        assert config('ENVFILE') == 'env value'
+        assert config('inifile') == '/srv/ini value'
+
+    parser.assert_not_called()
+    assert config.explain('ENVFILE')[0].location == f'{envfile}:1'
+
+
+def test_snapshot_restores_ini_file_interpolation_errors(project, tmp_path):
+    _, app_dir = project
+    snapshot = str(tmp_path / 'config.snapshot')
+    inifile = os.path.join(os.path.dirname(app_dir), 'settings.ini')
+    with open(inifile, 'a') as file_:
+        file_.write('broken=%(unknown)s\n')
+    Configuration(loaders=[IniFile(inifile)]).save_snapshot(snapshot)
+
+    config = Configuration(loaders=[IniFile(inifile)])
+    assert config.load_snapshot(snapshot)
+    assert config('inifile') == '/srv/ini value'
+    with pytest.raises(InterpolationError, match='unknown'):
+        config('broken')
+
+
+def test_stale_snapshot_changed_file(project, tmp_path):
+    root_dir, app_dir = project
+    snapshot = str(tmp_path / 'config.snapshot')
+    _config(root_dir, app_dir).save_snapshot(snapshot)
+
+    with open(os.path.join(app_dir, '.env'), 'a') as file_:
+        file_.write('OTHER=value\n')
+
+    config = _config(root_dir, app_dir)
+    assert not config.load_snapshot(snapshot)
+    assert config('OTHER') == 'value'
+
+
+def test_stale_snapshot_new_file(project, tmp_path):
+    root_dir, app_dir = project
+    snapshot = str(tmp_path / 'config.snapshot')
+    _config(root_dir, app_dir).save_snapshot(snapshot)
+
+    with open(os.path.join(root_dir, 'other.cfg'), 'w') as file_:
+        file_.write('[settings]\nother=value\n')
+
+    assert not _config(root_dir, app_dir).load_snapshot(snapshot)
+
+
+def test_snapshot_saved_in_a_searched_directory(project):
+    root_dir, app_dir = project
+    snapshot = os.path.join(app_dir, 'config.snapshot')
+    _config(root_dir, app_dir).save_snapshot(snapshot)
+    _config(root_dir, app_dir).save_snapshot(snapshot)  # replaces the previous one
+
+    assert _config(root_dir, app_dir).load_snapshot(snapshot)
+
+    with open(os.path.join(app_dir, 'other.cfg'), 'w') as file_:
+        file_.write('[settings]\nother=value\n')
+
+    assert not _config(root_dir, app_dir).load_snapshot(snapshot)
+
+
+def test_stale_snapshot_different_loaders(project, tmp_path):
+    root_dir, app_dir = project
+    snapshot = str(tmp_path / 'config.snapshot')
+    _config(root_dir, app_dir).save_snapshot(snapshot)
+
+    assert not Configuration(loaders=[Environment()]).load_snapshot(snapshot)
+    assert not Configuration(loaders=[RecursiveSearch(app_dir, root_path=app_dir)]).load_snapshot(snapshot)
+
+
+def test_rejected_snapshot_leaves_loaders_untouched(project, tmp_path):
+    _, app_dir = project
+    snapshot = str(tmp_path / 'config.snapshot')
+    envfile = os.path.join(app_dir, '.env')
+    inifile = os.path.join(os.path.dirname(app_dir), 'settings.ini')
+    Configuration(loaders=[EnvFile(envfile), IniFile(inifile)]).save_snapshot(snapshot)
+
+    envfile_loader = EnvFile(envfile)
+    config = Configuration(loaders=[envfile_loader, IniFile(inifile, section='other')])
+    assert not config.load_snapshot(snapshot)
+    assert envfile_loader.configs is None  # restored only if every loader accepts the snapshot
+
+
+@pytest.mark.parametrize('content', [b'', b'invalid', MAGIC + b'\xff\xff\xff\xff', MAGIC + b'\x01\x00\x00\x00\x00'])
+def test_invalid_snapshot(tmp_path, content):
+    snapshot = tmp_path / 'config.snapshot'
+    snapshot.write_bytes(content)
+
+    assert not Configuration(loaders=[Environment()]).load_snapshot(str(snapshot))
+
+
+def test_missing_snapshot(tmp_path):
+    assert not Configuration(loaders=[Environment()]).load_snapshot(str(tmp_path / 'missing'))
+
+
+def test_snapshot_skips_live_loaders(tmp_path, monkeypatch):
+    snapshot = str(tmp_path / 'config.snapshot')
+    loaders = [Environment(), CommandLine(parser=None, get_args=lambda parser: {'key': 'value'})]
+    Configuration(loaders=loaders).save_snapshot(snapshot)
+
+    monkeypatch.setenv('KEY', 'new value')
+    config = Configuration(loaders=loaders)
+    assert config.load_snapshot(snapshot)
+    assert config('key') == 'new value'
+
+
+def test_load_snapshot_invalidates_cache(project, tmp_path):
+    root_dir, app_dir = project
+    snapshot = str(tmp_path / 'config.snapshot')
+    _config(root_dir, app_dir).save_snapshot(snapshot)
+
+    config = Configuration(loaders=[RecursiveSearch(app_dir, root_path=root_dir)], cache=True)
+    assert config('UNKNOWN', default=None) is None
+    config._cache[('ENVFILE',)] = 'cached'
+
+    assert config.load_snapshot(snapshot)
+    assert config._cache == {}